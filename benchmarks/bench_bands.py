@@ -0,0 +1,56 @@
+"""Przyspieszenie trybu pikseli CTR z pasami wierszy (ctr.modify_png_ctr(..., bands=True)) w funkcji liczby procesów.
+
+Dla dużego syntetycznego obrazu mierzy szyfrowanie i deszyfrowanie pasami dla kolejnych liczb procesów
+oraz zwykły tryb pikseli (jeden strumień zlib) jako punkt odniesienia.
+
+Uruchomienie: python benchmarks/bench_bands.py [--size 2048] [--workers 1 2 4 8] [--band-size 1048576]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_pipelines import best_time, inflated_idat, make_png
+from helper_functions import generate_rsa_keys
+import ctr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=2048, help="bok obrazu RGB w pikselach")
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}), help="liczby procesów do porównania")
+    parser.add_argument('--band-size', type=int, default=ctr.BAND_SIZE)
+    parser.add_argument('--bits', type=int, default=1024)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    public_key, private_key = generate_rsa_keys(args.bits)
+    with tempfile.TemporaryDirectory() as tmp:
+        original = os.path.join(tmp, 'original.png')
+        encrypted = os.path.join(tmp, 'encrypted.png')
+        decrypted = os.path.join(tmp, 'decrypted.png')
+        raw_bytes = make_png(original, args.size, args.size, 2)
+        print(f"obraz {args.size}x{args.size} RGB, {raw_bytes / 1e6:.1f} MB danych, {os.cpu_count()} rdzeni")
+
+        baseline = best_time(lambda: ctr.modify_png_ctr(original, public_key, encrypted, 1, pixels=True), args.repeat)
+        print(f"{'tryb':<18}{'procesy':>8}{'szyfr. [s]':>12}{'deszyfr. [s]':>14}{'przyspieszenie':>16}")
+        print(f"{'piksele':<18}{1:>8}{baseline:>12.3f}{'-':>14}{'-':>16}")
+        single = None
+        for workers in args.workers:
+            encrypt = best_time(lambda: ctr.modify_png_ctr(original, public_key, encrypted, workers, bands=True,
+                                                           band_size=args.band_size), args.repeat)
+            decrypt = best_time(lambda: ctr.decrypt_and_reconstruct_png_ctr(
+                encrypted, public_key, private_key, decrypted, workers, bands=True, band_size=args.band_size),
+                args.repeat)
+            if inflated_idat(decrypted) != inflated_idat(original):
+                raise SystemExit(f"workers={workers}: odszyfrowany obraz różni się od oryginału")
+            single = single or encrypt
+            print(f"{'pasy':<18}{workers:>8}{encrypt:>12.3f}{decrypt:>14.3f}{single / encrypt:>15.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Rozmiar i czas kompresji strumienia IDAT dla różnych poziomów, strategii i liczby wątków (deflate.Compression).
+
+Dane to zdekompresowany IDAT syntetycznego obrazu (jak przy ponownej kompresji po deszyfrowaniu)
+oraz losowe bajty (jak szyfrogram).
+
+Uruchomienie: python benchmarks/bench_compression.py [--size 1024] [--levels 1 6 9] [--threads 1 2 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_pipelines import inflated_idat, make_png
+from deflate import STRATEGIES, Compression
+
+
+def compress(settings, data, step=4 * 1024 * 1024):
+    # Dane podawane oknami, tak jak robi to IdatStream
+    compressor = settings.compressobj()
+    size = 0
+    for i in range(0, len(data), step):
+        size += len(compressor.compress(data[i:i + step]))
+    return size + len(compressor.flush())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=1024, help="bok obrazu RGB w pikselach")
+    parser.add_argument('--levels', type=int, nargs='+', default=[0, 1, 6, 9])
+    parser.add_argument('--strategies', nargs='+', default=['default', 'filtered', 'rle'], choices=sorted(STRATEGIES))
+    parser.add_argument('--threads', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'image.png')
+        make_png(path, args.size, args.size, 2)
+        inputs = {'obraz': inflated_idat(path), 'szyfrogram': os.urandom(args.size * args.size * 3)}
+
+    print(f"{'dane':<12}{'poziom':>7} {'strategia':<10}{'wątki':>6}{'rozmiar':>12}{'stopień':>9}{'czas [s]':>10}{'MB/s':>9}")
+    for name, data in inputs.items():
+        for level in args.levels:
+            for strategy in args.strategies:
+                for threads in args.threads:
+                    start = time.perf_counter()
+                    size = compress(Compression(level, strategy, threads), data)
+                    elapsed = time.perf_counter() - start
+                    print(f"{name:<12}{level:>7} {strategy:<10}{threads:>6}{size:>12}{size / len(data):>9.3f}"
+                          f"{elapsed:>10.3f}{len(data) / 1e6 / elapsed:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Porównanie deszyfrowania RSA: zwykłe pow(c, d, n) vs CRT.
+
+Uruchomienie: python benchmarks/bench_crt.py [--bits 1024 2048] [--repeat 3]
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from helper_functions import generate_rsa_keys, read_png
+from rsa import modify_png, decrypt_and_reconstruct_png
+from bench_pipelines import best_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bits', type=int, nargs='+', default=[1024, 2048])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--mode', type=int, choices=[0, 1], default=0)
+    args = parser.parse_args()
+
+    images = sorted(glob.glob(os.path.join(ROOT, 'example*.png')))
+    print(f"{'plik':<16}{'bity':>6}{'plain [s]':>12}{'crt [s]':>12}{'x':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        encrypted_path = os.path.join(tmp, 'enc.png')
+        plain_path = os.path.join(tmp, 'plain.png')
+        crt_path = os.path.join(tmp, 'crt.png')
+        for bits in args.bits:
+            public_key, private_key = generate_rsa_keys(bits=bits)
+            for image in images:
+                modify_png(image, public_key, encrypted_path, args.mode)
+                plain = best_time(lambda: decrypt_and_reconstruct_png(
+                    encrypted_path, private_key, plain_path, args.mode, use_crt=False), args.repeat)
+                crt = best_time(lambda: decrypt_and_reconstruct_png(
+                    encrypted_path, private_key, crt_path, args.mode, use_crt=True), args.repeat)
+                if read_png(plain_path) != read_png(crt_path):
+                    raise SystemExit(f"{image}: wynik CRT różni się od zwykłego deszyfrowania")
+                name = os.path.basename(image)
+                print(f"{name:<16}{bits:>6}{plain:>12.4f}{crt:>12.4f}{plain / crt:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Czas parsowania bloku EXIF (exif.Exif) z setkami tagów: same wpisy, odczyt jednego tagu i pełne dekodowanie.
+
+Blok jest syntetyczny: IFD0 ze wskaźnikiem na podkatalog Exif zawierający --tags wpisów
+(na przemian LONG, RATIONAL i ASCII spoza wpisu).
+
+Uruchomienie: python benchmarks/bench_exif.py [--tags 500] [--byte-order little|big] [--repeat 2000]
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import exif
+
+
+def make_exif(tags, order):
+    """Blok TIFF: IFD0 (Make, ExifOffset) -> podkatalog Exif z tags wpisami, wartości za katalogiem."""
+    prefix = b'II' if order == '<' else b'MM'
+    ifd0_size = 2 + 2 * 12 + 4
+    sub_offset = 8 + ifd0_size
+    values_offset = sub_offset + 2 + 12 * tags + 4
+
+    entries = []
+    values = bytearray()
+    for i in range(tags):
+        tag = 40000 + i
+        if i % 3 == 0:
+            entries.append(struct.pack(order + 'HHLL', tag, 4, 1, i))
+        elif i % 3 == 1:
+            entries.append(struct.pack(order + 'HHLL', tag, 5, 1, values_offset + len(values)))
+            values += struct.pack(order + 'LL', i, 100)
+        else:
+            text = f'value {i}'.encode() + b'\x00'
+            entries.append(struct.pack(order + 'HHLL', tag, 2, len(text), values_offset + len(values)))
+            values += text + b'\x00' * (len(text) % 2)
+
+    make = b'Bench\x00'
+    make_offset = values_offset + len(values)
+    ifd0 = (struct.pack(order + 'H', 2)
+            + struct.pack(order + 'HHLL', 271, 2, len(make), make_offset)
+            + struct.pack(order + 'HHLL', exif.EXIF_IFD, 4, 1, sub_offset)
+            + struct.pack(order + 'L', 0))
+    sub = struct.pack(order + 'H', tags) + b''.join(entries) + struct.pack(order + 'L', 0)
+    return prefix + struct.pack(order + 'HL', 42, 8) + ifd0 + sub + bytes(values) + make
+
+
+def per_call(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tags', type=int, default=500)
+    parser.add_argument('--byte-order', choices=['little', 'big'], default='little')
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    data = make_exif(args.tags, '<' if args.byte_order == 'little' else '>')
+    parsed = exif.Exif(data)
+    assert parsed['Exif'][40001] == 0.01 and parsed.find('Make') == 'Bench'
+
+    timings = {
+        'parsowanie wpisów': per_call(lambda: exif.Exif(data), args.repeat),
+        'parsowanie + jeden tag': per_call(lambda: exif.Exif(data).find('Make'), args.repeat),
+        'pełne dekodowanie': per_call(lambda: exif.read_exif(data), max(1, args.repeat // 10)),
+    }
+    print(f"{len(data)} B, {args.tags + 2} tagów, kolejność {args.byte_order}")
+    for name, seconds in timings.items():
+        print(f"{name:<24}{seconds * 1e6:>10.1f} µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Skalowanie szyfrowania i deszyfrowania OAEP (lib_version.OaepCipher) z liczbą wątków.
+
+Uruchomienie: python benchmarks/bench_oaep.py [--bits 2048] [--blocks 2000] [--threads 1 2 4 8]
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+import lib_version
+from bench_pipelines import best_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bits', type=int, default=2048)
+    parser.add_argument('--blocks', type=int, default=2000, help="liczba bloków OAEP w danych")
+    parser.add_argument('--threads', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=args.bits)
+    public_key = private_key.public_key()
+    data = os.urandom(lib_version.oaep_block_size(public_key) * args.blocks)
+    encrypted = lib_version.rsa_encrypt(data, public_key, threads=1)
+
+    print(f"RSA-{args.bits}, {args.blocks} bloków ({len(data) / 1e3:.0f} kB)")
+    print(f"{'wątki':>6}{'szyfrowanie [s]':>18}{'deszyfrowanie [s]':>20}{'przyspieszenie':>16}")
+    baseline = None
+    for threads in args.threads:
+        encrypt = best_time(lambda: lib_version.rsa_encrypt(data, public_key, threads), args.repeat)
+        decrypt = best_time(lambda: lib_version.rsa_decrypt(encrypted, private_key, threads), args.repeat)
+        baseline = baseline or decrypt
+        print(f"{threads:>6}{encrypt:>18.3f}{decrypt:>20.3f}{baseline / decrypt:>15.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Częściowe deszyfrowanie CTR (ctr.CtrRandomAccess): kilka wierszy ze środka obrazu wobec pełnego deszyfrowania.
+
+Porównuje plik w trybie pasów (z indeksem INDEX_CHUNK, dekompresja od najbliższego pasa)
+i w zwykłym trybie pikseli (dekompresja od początku strumienia).
+
+Uruchomienie: python benchmarks/bench_partial.py [--size 1024] [--rows 16] [--band-size 262144]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_pipelines import best_time, inflated_idat, make_png
+from helper_functions import generate_rsa_keys
+import ctr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=1024, help="bok obrazu RGB w pikselach")
+    parser.add_argument('--rows', type=int, default=16, help="liczba odczytywanych wierszy")
+    parser.add_argument('--band-size', type=int, default=256 * 1024)
+    parser.add_argument('--bits', type=int, default=1024)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    public_key, private_key = generate_rsa_keys(args.bits)
+    first = args.size // 2
+    with tempfile.TemporaryDirectory() as tmp:
+        original = os.path.join(tmp, 'original.png')
+        decrypted = os.path.join(tmp, 'decrypted.png')
+        make_png(original, args.size, args.size, 2)
+        plain = inflated_idat(original)
+        row_bytes = args.size * 3 + 1
+        expected = plain[first * row_bytes:(first + args.rows) * row_bytes]
+
+        print(f"obraz {args.size}x{args.size} RGB, wiersze {first}..{first + args.rows - 1}")
+        print(f"{'plik':<10}{'pełne [s]':>12}{'wiersze [s]':>14}{'przyspieszenie':>16}")
+        for name, options in (('pasy', {'bands': True, 'band_size': args.band_size}), ('piksele', {'pixels': True})):
+            encrypted = os.path.join(tmp, f'{name}.png')
+            ctr.modify_png_ctr(original, public_key, encrypted, args.workers, **options)
+            full = best_time(lambda: ctr.decrypt_and_reconstruct_png_ctr(
+                encrypted, public_key, private_key, decrypted, args.workers), args.repeat)
+            read_rows = lambda: ctr.decrypt_png_ctr_rows(encrypted, public_key, first, first + args.rows, args.workers)
+            partial = best_time(read_rows, args.repeat)
+            if read_rows() != expected:
+                raise SystemExit(f"{name}: odszyfrowane wiersze różnią się od oryginału")
+            print(f"{name:<10}{full:>12.3f}{partial:>14.4f}{full / partial:>15.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Porównanie potoków rsa.py, lib_version.py i ctr.py na syntetycznych obrazach PNG.
+
+Dla każdego obrazu i potoku mierzy czas szyfrowania i deszyfrowania, przepustowość,
+szczytowe zużycie pamięci (tracemalloc) i współczynnik rozrostu pliku; wynik w JSON.
+
+Uruchomienie: python benchmarks/bench_pipelines.py [--sizes 64 256] [--output wynik.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from helper_functions import generate_rsa_keys
+from png_stream import CHANNELS, ChunkWriter, iter_chunks
+from keystream_cache import KeystreamCache
+import ctr
+import lib_version
+import rsa
+
+def make_png(path, width, height, color_type, seed=0):
+    """Zapisuje syntetyczny PNG 8-bit: gradient z zaszumionymi wierszami (częściowo kompresowalny)."""
+    rng = random.Random(seed)
+    row_bytes = width * CHANNELS[color_type]
+    raw = bytearray()
+    for y in range(height):
+        raw.append(0)  # filtr None
+        if y % 4 == 3:
+            raw += rng.randbytes(row_bytes)
+        else:
+            raw += bytes((x + y) & 0xff for x in range(row_bytes))
+    with open(path, 'wb') as file:
+        writer = ChunkWriter(file)
+        writer.write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0))
+        if color_type == 3:
+            writer.write_chunk(b'PLTE', bytes(range(256)) * 3)
+        writer.write_chunk(b'IDAT', zlib.compress(raw))
+        writer.write_chunk(b'IEND', b'')
+    return len(raw)
+
+
+def inflated_idat(path):
+    with open(path, 'rb') as file:
+        return zlib.decompress(b''.join(data for chunk_type, data, crc in iter_chunks(file) if chunk_type == b'IDAT'))
+
+
+def pipelines(keys, workers):
+    public_key, private_key = keys
+    oaep_public, oaep_private = lib_version.to_cryptography_keys(public_key, private_key)
+    cache = KeystreamCache()
+    return {
+        'rsa-mode0': (lambda src, dst: rsa.modify_png(src, public_key, dst, 0, workers),
+                      lambda src, dst: rsa.decrypt_and_reconstruct_png(src, private_key, dst, 0, workers=workers)),
+        'rsa-mode1': (lambda src, dst: rsa.modify_png(src, public_key, dst, 1, workers),
+                      lambda src, dst: rsa.decrypt_and_reconstruct_png(src, private_key, dst, 1, workers=workers)),
+        'lib_version-mode0': (lambda src, dst: lib_version.modify_png(src, oaep_public, dst, 0),
+                              lambda src, dst: lib_version.decrypt_and_reconstruct_png(src, oaep_private, dst, 0)),
+        'lib_version-mode1': (lambda src, dst: lib_version.modify_png(src, oaep_public, dst, 1),
+                              lambda src, dst: lib_version.decrypt_and_reconstruct_png(src, oaep_private, dst, 1)),
+        'lib_version-hybrid': (lambda src, dst: lib_version.modify_png(src, oaep_public, dst, 0, hybrid=True),
+                               lambda src, dst: lib_version.decrypt_and_reconstruct_png(src, oaep_private, dst, 0)),
+        'ctr': (lambda src, dst: ctr.modify_png_ctr(src, public_key, dst, workers),
+                lambda src, dst: ctr.decrypt_and_reconstruct_png_ctr(src, public_key, private_key, dst, workers)),
+        'ctr-cached': (lambda src, dst: ctr.modify_png_ctr(src, public_key, dst, workers, cache=cache),
+                       lambda src, dst: ctr.decrypt_and_reconstruct_png_ctr(src, public_key, private_key, dst, workers,
+                                                                            cache=cache)),
+        'ctr-pixels': (lambda src, dst: ctr.modify_png_ctr(src, public_key, dst, workers, pixels=True),
+                       lambda src, dst: ctr.decrypt_and_reconstruct_png_ctr(src, public_key, private_key, dst,
+                                                                            workers)),
+    }
+
+
+def best_time(func, repeat):
+    """Najlepszy czas func() z repeat przebiegów (wspólny dla wszystkich benchmarków)."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(func, src, dst, repeat):
+    """Najlepszy czas z repeat przebiegów oraz szczytowa pamięć z osobnego przebiegu pod tracemalloc."""
+    best = best_time(lambda: func(src, dst), repeat)
+    tracemalloc.start()
+    func(src, dst)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    size = os.path.getsize(src)
+    return {'seconds': best, 'bytes_per_s': size / best if best else None, 'peak_memory_bytes': peak}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[32, 128, 256], help="boki obrazów w pikselach")
+    parser.add_argument('--color-types', type=int, nargs='+', default=[0, 2, 3, 6], choices=sorted(CHANNELS))
+    parser.add_argument('--pipelines', nargs='+', help="podzbiór potoków (domyślnie wszystkie)")
+    parser.add_argument('--bits', type=int, default=1024)
+    parser.add_argument('--workers', type=int, default=1, help="procesy w rsa.py/ctr.py")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--output', help="plik JSON (domyślnie stdout)")
+    args = parser.parse_args()
+
+    keys = generate_rsa_keys(args.bits)
+    selected = pipelines(keys, args.workers)
+    if args.pipelines:
+        selected = {name: selected[name] for name in args.pipelines}
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        original = os.path.join(tmp, 'original.png')
+        encrypted = os.path.join(tmp, 'encrypted.png')
+        decrypted = os.path.join(tmp, 'decrypted.png')
+        for size in args.sizes:
+            for color_type in args.color_types:
+                raw_bytes = make_png(original, size, size, color_type)
+                for name, (encrypt, decrypt) in selected.items():
+                    encrypt_stats = measure(encrypt, original, encrypted, args.repeat)
+                    decrypt_stats = measure(decrypt, encrypted, decrypted, args.repeat)
+                    if inflated_idat(decrypted) != inflated_idat(original):
+                        raise SystemExit(f"{name}: odszyfrowany obraz różni się od oryginału")
+                    result = {
+                        'pipeline': name,
+                        'width': size,
+                        'height': size,
+                        'color_type': color_type,
+                        'raw_bytes': raw_bytes,
+                        'input_bytes': os.path.getsize(original),
+                        'encrypted_bytes': os.path.getsize(encrypted),
+                        'expansion_ratio': os.path.getsize(encrypted) / os.path.getsize(original),
+                        'encrypt': encrypt_stats,
+                        'decrypt': decrypt_stats,
+                    }
+                    results.append(result)
+                    print(f"{name:<20}{size:>6}px ct={color_type} enc {encrypt_stats['seconds']:.4f} s "
+                          f"dec {decrypt_stats['seconds']:.4f} s x{result['expansion_ratio']:.2f}", file=sys.stderr)
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'bits': args.bits,
+        'workers': args.workers,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Mikrobenchmark backendów potęgowania modularnego (python vs gmpy2) dla różnych długości klucza.
+
+Mierzy operację publiczną (e = 65537), prywatną (d) i prywatną przez CRT, pojedynczo i listą.
+
+Uruchomienie: python benchmarks/bench_powmod.py [--bits 1024 2048 4096] [--count 200]
+"""
+import argparse
+import os
+import secrets
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from helper_functions import generate_rsa_keys
+import powmod
+
+
+def ops_per_second(func, count):
+    start = time.perf_counter()
+    func()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bits', type=int, nargs='+', default=[1024, 2048, 4096])
+    parser.add_argument('--count', type=int, default=200, help="liczba potęgowań na pomiar")
+    parser.add_argument('--backends', nargs='+', default=['python', 'gmpy2'])
+    args = parser.parse_args()
+
+    print(f"{'bity':>6} {'backend':<8}{'publ. [op/s]':>14}{'pryw. [op/s]':>14}{'CRT [op/s]':>12}{'lista [op/s]':>14}")
+    for bits in args.bits:
+        (e, n), private_key = generate_rsa_keys(bits)
+        d, p, q = private_key[0], private_key.p, private_key.q
+        bases = [secrets.randbelow(n) for _ in range(args.count)]
+        for backend in args.backends:
+            try:
+                powmod.set_backend(backend)
+            except ImportError:
+                print(f"{bits:>6} {backend:<8} niedostępny")
+                continue
+            public = ops_per_second(lambda: [powmod.powmod(base, e, n) for base in bases], args.count)
+            private = ops_per_second(lambda: [powmod.powmod(base, d, n) for base in bases], args.count)
+            crt = ops_per_second(lambda: (powmod.powmod_list([base % p for base in bases], private_key.dP, p),
+                                          powmod.powmod_list([base % q for base in bases], private_key.dQ, q)),
+                                 args.count)
+            batched = ops_per_second(lambda: powmod.powmod_list(bases, d, n), args.count)
+            print(f"{bits:>6} {backend:<8}{public:>14.0f}{private:>14.1f}{crt:>12.1f}{batched:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
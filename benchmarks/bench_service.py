@@ -0,0 +1,82 @@
+"""Klient obciążeniowy service.PngCryptoService: opóźnienia p50/p99 i przepustowość przy równoległych żądaniach.
+
+Uruchomienie: python benchmarks/bench_service.py [--scheme ctr] [--requests 200] [--concurrency 16] [--no-wait]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_pipelines import make_png
+from helper_functions import generate_rsa_keys
+from service import SCHEMES, PngCryptoService
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run(args, png):
+    latencies = []
+    rejected = 0
+    clients = asyncio.Semaphore(args.concurrency)
+
+    async with PngCryptoService(generate_rsa_keys(args.bits), args.scheme, args.workers,
+                                args.max_concurrency, args.max_queue) as service:
+        async def request():
+            nonlocal rejected
+            async with clients:
+                start = time.perf_counter()
+                try:
+                    encrypted = await service.encrypt(png, wait=not args.no_wait)
+                    if args.roundtrip:
+                        await service.decrypt(encrypted, wait=not args.no_wait)
+                except asyncio.QueueFull:
+                    rejected += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(request() for _ in range(args.requests)))
+        wall = time.perf_counter() - start
+    return latencies, rejected, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scheme', choices=SCHEMES, default='ctr')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16, help="równoległe żądania klienta")
+    parser.add_argument('--size', type=int, default=128, help="bok obrazu w pikselach")
+    parser.add_argument('--bits', type=int, default=1024)
+    parser.add_argument('--workers', type=int, help="procesy usługi (domyślnie liczba rdzeni)")
+    parser.add_argument('--max-concurrency', type=int)
+    parser.add_argument('--max-queue', type=int, default=64)
+    parser.add_argument('--no-wait', action='store_true', help="przy pełnej kolejce odrzucaj zamiast czekać")
+    parser.add_argument('--roundtrip', action='store_true', help="szyfrowanie i deszyfrowanie w jednym żądaniu")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'image.png')
+        make_png(path, args.size, args.size, 2)
+        with open(path, 'rb') as file:
+            png = file.read()
+
+    latencies, rejected, wall = asyncio.run(run(args, png))
+    if not latencies:
+        raise SystemExit(f"Wszystkie żądania odrzucone ({rejected})")
+    print(f"schemat {args.scheme}, {len(png) / 1e3:.1f} kB na żądanie, klient {args.concurrency} równolegle")
+    print(f"ukończone {len(latencies)}/{args.requests}, odrzucone {rejected}, {len(latencies) / wall:.1f} żądań/s")
+    print(f"p50 {percentile(latencies, 0.50) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms, "
+          f"średnia {statistics.mean(latencies) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
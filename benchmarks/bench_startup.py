@@ -0,0 +1,57 @@
+"""Czas zimnego importu modułów szyfrujących (każdy pomiar w nowym procesie).
+
+Sprawdza też, że import nie ładuje ciężkich bibliotek (matplotlib, PIL, numpy, sympy, tkinter).
+
+Uruchomienie: python benchmarks/bench_startup.py [--repeat 5] [--budget-ms 50]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ['helper_functions', 'png_stream', 'parallel', 'keystore', 'keystream_cache', 'rsa', 'ctr', 'lib_version', 'exif', 'main']
+# Moduły, które muszą mieścić się w budżecie (lib_version ładuje bibliotekę cryptography)
+CRYPTO_PATH = ['helper_functions', 'png_stream', 'parallel', 'keystore', 'keystream_cache', 'rsa', 'ctr']
+HEAVY = ['matplotlib', 'PIL', 'numpy', 'sympy', 'tkinter']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def import_time(module):
+    output = subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY)], cwd=ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=50.0)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'moduł':<18}{'mediana [ms]':>14}{'min [ms]':>10}  ciężkie importy")
+    for module in MODULES:
+        samples = [import_time(module) for _ in range(args.repeat)]
+        times = [sample['seconds'] * 1000 for sample in samples]
+        heavy = samples[0]['heavy']
+        median = statistics.median(times)
+        over_budget = module in CRYPTO_PATH and (median > args.budget_ms or heavy)
+        failed = failed or over_budget
+        print(f"{module:<18}{median:>14.1f}{min(times):>10.1f}  {', '.join(heavy) or '-'}"
+              f"{'  <-- ponad budżet' if over_budget else ''}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
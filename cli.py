@@ -0,0 +1,169 @@
+"""Wsadowe szyfrowanie i deszyfrowanie plików PNG.
+
+Przykłady:
+    python cli.py encrypt --scheme ctr --key rsa_1024.key -o out/ images/
+    python cli.py decrypt --scheme rsa --mode 1 --key rsa_1024.key -o dec/ 'out/*.png'
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from deflate import STRATEGIES, Compression
+
+SCHEMES = ['rsa', 'lib_version', 'ctr']
+
+
+def collect_inputs(patterns):
+    """Rozwija katalogi i wzorce glob do posortowanej listy plików PNG (bez powtórzeń)."""
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '*.png'))
+        else:
+            matches = glob.glob(pattern)
+        for path in sorted(matches):
+            # Ten sam plik podany różnymi ścieżkami (np. a.png i ./a.png) przetwarzany jest raz
+            real_path = os.path.realpath(path)
+            if os.path.isfile(path) and real_path not in seen:
+                seen.add(real_path)
+                paths.append(path)
+    return paths
+
+
+def output_paths(paths, output):
+    """Ścieżki wyjściowe zachowujące układ katalogów względem wspólnego katalogu wejść.
+
+    Dzięki temu pliki o tej samej nazwie z różnych katalogów (np. imgs/a.png i imgs/sub/a.png)
+    nie trafiają do jednego pliku wyjściowego.
+    """
+    sources = [os.path.abspath(path) for path in paths]
+    root = os.path.commonpath([os.path.dirname(source) for source in sources])
+    return [os.path.join(output, os.path.relpath(source, root)) for source in sources]
+
+
+def process_file(command, scheme, key_path, src, dst, mode=0, hybrid=False, compact=False, compression=None,
+                 pixels=False):
+    """Szyfruje lub deszyfruje jeden plik; zwraca (rozmiar wejścia, czas w sekundach).
+
+    compression - deflate.Compression dla zapisywanego strumienia IDAT (mode 0).
+    """
+    from keystore import load_keys
+
+    start = time.perf_counter()
+    public_key, private_key = load_keys(key_path)
+    # Równoległość jest na poziomie plików, więc pojedynczy plik liczony jest szeregowo
+    if scheme == 'rsa':
+        import rsa
+        if command == 'encrypt':
+            rsa.modify_png(src, public_key, dst, mode, workers=1, compact=compact, compression=compression)
+        else:
+            rsa.decrypt_and_reconstruct_png(src, private_key, dst, mode, workers=1, compression=compression)
+    elif scheme == 'lib_version':
+        import lib_version
+        public_key, private_key = lib_version.to_cryptography_keys(public_key, private_key)
+        if command == 'encrypt':
+            lib_version.modify_png(src, public_key, dst, mode, hybrid=hybrid, compression=compression, threads=1)
+        else:
+            lib_version.decrypt_and_reconstruct_png(src, private_key, dst, mode, compression=compression, threads=1)
+    elif scheme == 'ctr':
+        import ctr
+        if command == 'encrypt':
+            ctr.modify_png_ctr(src, public_key, dst, workers=1, pixels=pixels, compression=compression)
+        else:
+            ctr.decrypt_and_reconstruct_png_ctr(src, public_key, private_key, dst, workers=1, compression=compression)
+    else:
+        raise ValueError(f"Nieznany schemat: {scheme}")
+    return os.path.getsize(src), time.perf_counter() - start
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('command', choices=['encrypt', 'decrypt'])
+    parser.add_argument('inputs', nargs='+', help="pliki PNG, katalogi lub wzorce glob")
+    parser.add_argument('-s', '--scheme', choices=SCHEMES, default='rsa')
+    parser.add_argument('-k', '--key', required=True,
+                        help="plik z kluczami (przy szyfrowaniu tworzony, jeśli nie istnieje)")
+    parser.add_argument('--bits', type=int,
+                        help="rozmiar nowego klucza (domyślnie 1024); istniejący plik musi mieć ten rozmiar")
+    parser.add_argument('-o', '--output', required=True, help="katalog wyjściowy")
+    parser.add_argument('-m', '--mode', type=int, choices=[0, 1], default=0,
+                        help="0 - dekompresja/szyfrowanie/kompresja, 1 - szyfrowanie surowych danych IDAT")
+    parser.add_argument('--hybrid', action='store_true', help="tryb hybrydowy AES-GCM (tylko lib_version)")
+    parser.add_argument('--compact', action='store_true',
+                        help="format kompaktowy bez paddingu, długość w chunku rsLN (tylko rsa)")
+    parser.add_argument('--pixels', action='store_true',
+                        help="szyfrowanie tylko bajtów pikseli, wynik pozostaje poprawnym PNG (tylko ctr)")
+    parser.add_argument('--compress-level', type=int, choices=range(-1, 10), default=-1, metavar='{-1..9}',
+                        help="poziom zlib zapisywanego strumienia IDAT przy mode 0 (0 - bez kompresji)")
+    parser.add_argument('--compress-strategy', choices=sorted(STRATEGIES), default='default',
+                        help="strategia zlib (np. rle - szybciej, filtered - dla danych po filtrach PNG)")
+    parser.add_argument('--compress-threads', type=int, default=1,
+                        help="wątki kompresji w ramach jednego pliku (bloki łączone sync flush)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help="liczba procesów")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    paths = collect_inputs(args.inputs)
+    if not paths:
+        print("Brak plików PNG do przetworzenia.", file=sys.stderr)
+        return 1
+
+    if args.command == 'encrypt':
+        from keystore import load_or_generate_keys
+        try:
+            load_or_generate_keys(args.key, args.bits)
+        except ValueError as error:
+            print(error, file=sys.stderr)
+            return 1
+    elif not os.path.exists(args.key):
+        print(f"Brak pliku z kluczami: {args.key}", file=sys.stderr)
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+
+    compression = Compression(args.compress_level, args.compress_strategy, args.compress_threads)
+    total_bytes = 0
+    failures = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = {}
+        destinations = set()
+        for path, dst in zip(paths, output_paths(paths, args.output)):
+            key = os.path.normcase(os.path.realpath(dst))
+            if key in destinations or (os.path.exists(dst) and os.path.samefile(path, dst)):
+                failures += 1
+                print(f"{path}: BŁĄD plik wyjściowy {dst} jest plikiem wejściowym lub wynikiem innego pliku",
+                      file=sys.stderr)
+                continue
+            destinations.add(key)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            future = executor.submit(process_file, args.command, args.scheme, args.key, path, dst,
+                                     args.mode, args.hybrid, args.compact, compression, args.pixels)
+            futures[future] = path
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                size, elapsed = future.result()
+            except Exception as error:
+                failures += 1
+                print(f"{path}: BŁĄD {error}", file=sys.stderr)
+                continue
+            total_bytes += size
+            print(f"{path}: {size / 1e6:.3f} MB, {elapsed * 1000:.1f} ms, "
+                  f"{size / 1e6 / max(elapsed, 1e-9):.2f} MB/s")
+    wall = time.perf_counter() - start
+
+    done = len(paths) - failures
+    print(f"Przetworzono {done}/{len(paths)} plików, {total_bytes / 1e6:.3f} MB w {wall:.2f} s "
+          f"({total_bytes / 1e6 / max(wall, 1e-9):.2f} MB/s)")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
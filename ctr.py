@@ -1,103 +1,622 @@
-import zlib
+import io
+import os
 import struct
-import numpy as np
-import matplotlib.pyplot as plt
-#from sympy import randprime
-from PIL import Image
-import random
-import math
+import zlib
+from collections import deque
+from functools import lru_cache
+from itertools import repeat
+from deflate import Compression, DeflateJoiner, deflate_piece
 from helper_functions import *
+from keystore import load_or_generate_keys
+from keystream_cache import KeystreamCache
+from main import read_IHDR
+from parallel import DEFAULT_SHARD_BLOCKS, MIN_PARALLEL_BLOCKS, WorkerPool
+from powmod import powmod_list
+from png_stream import (open_png, open_output, iter_chunks, scanline_passes, row_bands, IDAT_CHUNK_SIZE, WINDOW_SIZE,
+                        transform_png)
+
+# Private marker chunk written before IDAT when only pixel bytes are encrypted
+PIXEL_CHUNK = b'rsPX'
+# Private chunk written after IDAT in band mode: one entry per band with its inflated offset,
+# its offset in the zlib stream (the band is an independent deflate piece) and its keystream offset
+INDEX_CHUNK = b'rsIX'
+INDEX_ENTRY = struct.Struct('>QQQ')
+BAND_SIZE = 1024 * 1024  # Target inflated bytes of one independent row band
 
 def xor_bytes(a, b):
-    return bytes(x ^ y for x, y in zip(a, b))
+    # XOR of whole buffers as big integers runs in C instead of byte by byte
+    length = min(len(a), len(b))
+    x = int.from_bytes(memoryview(a)[:length], 'big') ^ int.from_bytes(memoryview(b)[:length], 'big')
+    return x.to_bytes(length, 'big')
 
 def generate_keystream(public_key, counter, length):
     e, n = public_key
-    keystream = bytearray()
-    while len(keystream) < length:
-        counter_bytes = counter.to_bytes((n.bit_length() + 7) // 8, byteorder='big')
-        counter_encrypted = int.from_bytes(counter_bytes, byteorder='big')
-        encrypted_counter = pow(counter_encrypted, e, n)
-        keystream.extend(encrypted_counter.to_bytes((n.bit_length() + 7) // 8, byteorder='big'))
-        counter += 1
-    return bytes(keystream[:length])
-
-
-def modify_png_ctr(file_path, public_key, save_path):
-    data = read_png(file_path)
-    new_png_data = bytearray(data[:8])
-    pos = 8
-    counter = 0  # Initial counter value
-    encrypted_image_data = bytearray()
-
-    while pos < len(data):
-        chunk_len = struct.unpack('>I', data[pos:pos + 4])[0]
-        chunk_type = data[pos + 4:pos + 8]
-        chunk_data = data[pos + 8:pos + 8 + chunk_len]
-        pos += 12 + chunk_len
-
-        if chunk_type == b'IDAT':
-            decompressed_data = zlib.decompress(chunk_data)
-            keystream = generate_keystream(public_key, counter, len(decompressed_data))
-            encrypted_data = xor_bytes(decompressed_data, keystream)
-            compressed_data = zlib.compress(encrypted_data)
-            chunk_data = compressed_data
-            chunk_len = len(chunk_data)
-            counter += 1
-            encrypted_image_data.extend(encrypted_data)
-
-        crc = zlib.crc32(chunk_type + chunk_data) & 0xffffffff
-        new_png_data += struct.pack('>I', chunk_len) + chunk_type + chunk_data + struct.pack('>I', crc)
-
-    with open(save_path, 'wb') as file:
-        file.write(new_png_data)
-
-    return encrypted_image_data
-
-
-def decrypt_and_reconstruct_png_ctr(encrypted_png_path, public_key, private_key, decrypted_png_path):
-    data = read_png(encrypted_png_path)
-    new_png_data = bytearray(data[:8])
-    pos = 8
-    counter = 0  # Initial counter value
-
-    while pos < len(data):
-        chunk_len = struct.unpack('>I', data[pos:pos + 4])[0]
-        chunk_type = data[pos + 4:pos + 8]
-        encrypted_chunk_data = data[pos + 8:pos + 8 + chunk_len]
-        pos += 12 + chunk_len
-
-        if chunk_type == b'IDAT':
-            decompressed_data = zlib.decompress(encrypted_chunk_data)
-            keystream = generate_keystream(public_key, counter, len(decompressed_data))
-            decrypted_data = xor_bytes(decompressed_data, keystream)
-            compressed_data = zlib.compress(decrypted_data)
-            chunk_data = compressed_data
-            chunk_len = len(chunk_data)
-            counter += 1
+    block_size = (n.bit_length() + 7) // 8
+    block_count = -(-length // block_size)
+    keystream = bytearray(block_count * block_size)  # Single preallocated buffer
+    encrypted_counters = powmod_list(range(counter, counter + block_count), e, n)
+    for i, encrypted_counter in enumerate(encrypted_counters):
+        keystream[i * block_size:(i + 1) * block_size] = encrypted_counter.to_bytes(block_size, byteorder='big')
+    del keystream[length:]
+    return keystream
+
+
+def counter_base(n):
+    # First counter of the global stream. Small counters leak plaintext: E(0) = 0 and E(1) = 1 for any e,
+    # and below n ** (1/3) there is no modular reduction for e = 3, so the stream starts at 2 ** (bits / 2)
+    return 1 << (n.bit_length() // 2)
+
+
+def keystream_at(public_key, offset, length):
+    # Keystream bytes [offset, offset + length) of the global stream, block i = E(counter_base(n) + i)
+    e, n = public_key
+    block_size = (n.bit_length() + 7) // 8
+    first_block, skip = divmod(offset, block_size)
+    keystream = generate_keystream(public_key, counter_base(n) + first_block, skip + length)
+    del keystream[:skip]
+    return keystream
+
+
+@lru_cache(maxsize=None)
+def palette_tables(palette_size, bit_depth):
+    # Pixel mode for indexed images (colour type 3): XOR would turn indices into values past PLTE, so
+    # every bit_depth-wide index v < palette_size becomes (v + k) % palette_size, k = the same bits of the
+    # keystream byte, and stays inside the palette (indices already past it are kept). This holds for
+    # rows with filter type 0, which encoders use for indexed images as the PNG spec recommends.
+    # Returns (encrypt, decrypt) tables indexed by keystream byte << 8 | pixel byte
+    mask = (1 << bit_depth) - 1
+    encrypt, decrypt = bytearray(1 << 16), bytearray(1 << 16)
+    for key in range(256):
+        for value in range(256):
+            encrypted = decrypted = 0
+            for shift in range(0, 8, bit_depth):
+                k, v = key >> shift & mask, value >> shift & mask
+                if v < palette_size:
+                    encrypted |= (v + k) % palette_size << shift
+                    decrypted |= (v - k) % palette_size << shift
+                else:
+                    encrypted |= v << shift
+                    decrypted |= v << shift
+            encrypt[key << 8 | value] = encrypted
+            decrypt[key << 8 | value] = decrypted
+    return bytes(encrypt), bytes(decrypt)
+
+
+def generate_keystreams(public_key, ranges, workers=None, shard_blocks=DEFAULT_SHARD_BLOCKS, cache=None, pool=None):
+    # ranges = [(offset, length), ...]; every range is split into shards computed in a process pool.
+    # With a KeystreamCache the shards are the cache segments, and only missing segments are computed.
+    # pool = parallel.WorkerPool kept by a stream across calls (replaces workers)
+    e, n = public_key
+    block_size = (n.bit_length() + 7) // 8
+    if cache is not None:
+        shard_blocks = cache.segment_blocks
+    shard_size = block_size * shard_blocks
+    pieces = []
+    for index, (offset, length) in enumerate(ranges):
+        start, end = offset, offset + length
+        while start < end:
+            stop = min(end, (start // shard_size + 1) * shard_size)
+            pieces.append((index, start, stop - start))
+            start = stop
+
+    if cache is None:
+        results = _compute_keystreams(public_key, [offset for index, offset, length in pieces],
+                                      [length for index, offset, length in pieces], workers, pool)
+        return _join_pieces(pieces, results, len(ranges))
+
+    segments = {}
+    for index, offset, length in pieces:
+        segment = offset // shard_size
+        if segment not in segments:
+            segments[segment] = cache.get(public_key, segment)
+    missing = [segment for segment, keystream in segments.items() if keystream is None]
+    computed = _compute_keystreams(public_key, [segment * shard_size for segment in missing],
+                                   [shard_size] * len(missing), workers, pool)
+    for segment, keystream in zip(missing, computed):
+        cache.put(public_key, segment, keystream)
+        segments[segment] = keystream
+    results = []
+    for index, offset, length in pieces:
+        skip = offset % shard_size
+        results.append(segments[offset // shard_size][skip:skip + length])
+    return _join_pieces(pieces, results, len(ranges))
+
+
+def _compute_keystreams(public_key, offsets, lengths, workers, pool=None):
+    e, n = public_key
+    block_size = (n.bit_length() + 7) // 8
+    if pool is not None:
+        workers = pool.workers
+    elif workers is None:
+        workers = os.cpu_count() or 1
+    total_blocks = sum(-(-length // block_size) for length in lengths)
+    if workers <= 1 or total_blocks < MIN_PARALLEL_BLOCKS:
+        return list(map(keystream_at, repeat(public_key), offsets, lengths))
+    if pool is not None:
+        return list(pool.get().map(keystream_at, repeat(public_key), offsets, lengths))
+    with WorkerPool(min(workers, len(offsets))) as pool:
+        return list(pool.get().map(keystream_at, repeat(public_key), offsets, lengths))
+
+
+def _join_pieces(pieces, results, count):
+    keystreams = [bytearray() for _ in range(count)]
+    for (index, offset, length), keystream in zip(pieces, results):
+        keystreams[index] += keystream
+    return keystreams
+
+
+class KeystreamXor:
+    # Streaming transform over the whole IDAT stream: byte i is XORed with
+    # keystream byte i, so no keystream block is ever reused.
+    # One process pool serves every window of the stream and is shut down in finalize
+    def __init__(self, public_key, workers=None, cache=None):
+        self.public_key = public_key
+        self.pool = WorkerPool(workers)
+        self.cache = cache
+        self.offset = 0
+
+    def update(self, data):
+        keystream = generate_keystreams(self.public_key, [(self.offset, len(data))], cache=self.cache,
+                                        pool=self.pool)[0]
+        self.offset += len(data)
+        return xor_bytes(data, keystream)
+
+    def finalize(self):
+        self.pool.close()
+        return b''
+
+
+class PixelKeystreamXor:
+    # Pixel-domain variant: scanlines are tracked with the IHDR layout and only pixel bytes are
+    # XORed, filter-type bytes pass through, so the output is still a decodable PNG of the same shape.
+    # Pixel byte j of the stream (filter bytes not counted) uses keystream byte j.
+    # passes = scanline_passes(ihdr) or a part of it starting at a row boundary, offset = its first pixel byte
+    # palette = a table from palette_tables (via palette_table) replaces XOR for indexed images
+    def __init__(self, public_key, passes, workers=None, cache=None, offset=0, palette=None):
+        self.public_key = public_key
+        self.pool = WorkerPool(workers)
+        self.cache = cache
+        self.palette = palette
+        self.passes = passes
+        self.pass_index = -1
+        self.rows_left = 0
+        self.in_row = 0  # Pixel bytes left in the current row
+        self.offset = offset
+
+    def _next_row(self):
+        while self.rows_left == 0:
+            if self.pass_index + 1 >= len(self.passes):
+                return False
+            self.pass_index += 1
+            self.rows_left = self.passes[self.pass_index][0]
+        self.rows_left -= 1
+        self.in_row = self.passes[self.pass_index][1]
+        return True
+
+    def update(self, data, keystream=None):
+        # keystream = keystream of these pixel bytes computed in advance (e.g. by PixelBandXor from its cache)
+        out = bytearray(data)
+        spans = []
+        pos = 0
+        while pos < len(out):
+            if self.in_row == 0:
+                if not self._next_row():
+                    break  # Bytes past the last row are left as they are
+                pos += 1  # Filter-type byte
+                continue
+            take = min(self.in_row, len(out) - pos)
+            spans.append((pos, pos + take))
+            pos += take
+            self.in_row -= take
+        if not spans:
+            return out
+        total = sum(end - start for start, end in spans)
+        if keystream is None:
+            keystream = generate_keystreams(self.public_key, [(self.offset, total)], cache=self.cache,
+                                            pool=self.pool)[0]
+        self.offset += total
+        with memoryview(out) as view:
+            pixels = b''.join(view[start:end] for start, end in spans)
+            if self.palette is None:
+                pixels = xor_bytes(pixels, keystream)
+            else:
+                table = self.palette
+                pixels = bytes([table[key << 8 | value] for key, value in zip(keystream, pixels)])
+            pos = 0
+            for start, end in spans:
+                view[start:end] = pixels[pos:pos + end - start]
+                pos += end - start
+        return out
+
+    def finalize(self):
+        self.pool.close()
+        return b''
+
+
+def xor_band(public_key, passes, offset, data, compression, cache=None, palette=None, keystream=None):
+    # One row band: XOR its pixel bytes and deflate it as an independent piece (runs in a worker process)
+    out = PixelKeystreamXor(public_key, passes, 1, cache, offset, palette).update(data, keystream)
+    return deflate_piece(out, compression.level, compression.strategy), zlib.adler32(out), len(out)
+
+
+class PixelBandXor:
+    # Pixel-domain CTR over independent row bands: every band is XORed and deflated on its own
+    # (in a process pool when workers > 1) and the pieces are joined into a single zlib stream,
+    # so the output is already compressed (transform_png(..., compress=False)).
+    # compression = deflate.Compression: level and strategy of every band; its threads are not used,
+    # the bands are already deflated in parallel by the pool
+    def __init__(self, public_key, passes, workers=None, cache=None, band_size=BAND_SIZE, compression=None,
+                 palette=None):
+        e, n = public_key
+        block_size = (n.bit_length() + 7) // 8
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if sum(rows * row_bytes for rows, row_bytes in passes) < MIN_PARALLEL_BLOCKS * block_size:
+            workers = 1
+        if compression is None:
+            compression = Compression()
+        self.public_key = public_key
+        self.workers = workers
+        self.pool = WorkerPool(workers)
+        self.cache = cache
+        self.compression = compression
+        self.palette = palette
+        self.bands = deque(row_bands(passes, band_size))
+        self.buffer = bytearray()
+        self.offset = 0
+        self.inflated = 0
+        self.compressed = 0  # Bytes of the joined zlib stream returned so far
+        self.starts = deque()  # (inflated offset, keystream offset) of the bands in flight
+        self.index = []  # (inflated offset, compressed offset, keystream offset) of the joined bands
+        self.joiner = DeflateJoiner(compression.level)
+        self.pending = deque()
+
+    def _submit(self, passes, data):
+        offset = self.offset
+        size = sum(rows * row_bytes for rows, row_bytes in passes)
+        self.offset += size
+        self.starts.append((self.inflated, offset))
+        self.inflated += len(data)
+        if self.workers <= 1:
+            self.pending.append(xor_band(self.public_key, passes, offset, data, self.compression, self.cache,
+                                         self.palette))
+            return
+        keystream = None
+        if self.cache is not None:
+            # The cache lives in this process: its segments (missing ones computed in the pool) go with the band
+            keystream = generate_keystreams(self.public_key, [(offset, size)], cache=self.cache, pool=self.pool)[0]
+        self.pending.append(self.pool.get().submit(xor_band, self.public_key, passes, offset, data, self.compression,
+                                                   None, self.palette, keystream))
+
+    def _collect(self, wait=False):
+        # Pieces are joined in band order; at most 2 * workers bands are in flight
+        out = bytearray()
+        while self.pending:
+            result = self.pending[0]
+            if not isinstance(result, tuple):
+                if not (wait or result.done() or len(self.pending) > 2 * self.workers):
+                    break
+                result = result.result()
+            self.pending.popleft()
+            inflated, keystream = self.starts.popleft()
+            piece = self.joiner.add(*result)
+            # The zlib header precedes the first band
+            self.index.append((inflated, self.compressed + len(piece) - len(result[0]), keystream))
+            self.compressed += len(piece)
+            out += piece
+        return out
+
+    def update(self, data):
+        self.buffer += data
+        pos = 0
+        while self.bands:
+            rows, row_bytes = self.bands[0]
+            size = rows * (row_bytes + 1)
+            if len(self.buffer) - pos < size:
+                break
+            self.bands.popleft()
+            self._submit([(rows, row_bytes)], bytes(self.buffer[pos:pos + size]))
+            pos += size
+        del self.buffer[:pos]
+        return self._collect()
+
+    def finalize(self):
+        try:
+            if self.buffer:
+                # Truncated stream or bytes past the last row, handled with the remaining layout
+                self._submit(list(self.bands), bytes(self.buffer))
+                self.buffer = bytearray()
+            out = self._collect(wait=True)
+        finally:
+            self.pool.close()
+        return out + self.joiner.finish()
+
+    def index_chunks(self):
+        # For transform_png(append_chunks=...), called once the stream is finished
+        return [(INDEX_CHUNK, b''.join(INDEX_ENTRY.pack(*entry) for entry in self.index))]
+
+
+class CtrDecryptor:
+    # Whole-stream keystream by default, pixel-domain once PIXEL_CHUNK has been seen
+    def __init__(self, public_key, ihdr, workers=None, cache=None, palette=None):
+        self.public_key = public_key
+        self.ihdr = ihdr
+        self.workers = workers
+        self.cache = cache
+        self.palette = palette
+        self.stream = KeystreamXor(public_key, workers, cache)
+
+    def use_pixels(self, chunk_data):
+        self.stream.finalize()  # Nothing was XORed yet (the chunk precedes IDAT), only its pool is released
+        self.stream = PixelKeystreamXor(self.public_key, scanline_passes(self.ihdr), self.workers, self.cache,
+                                        palette=self.palette)
+
+    def update(self, data):
+        return self.stream.update(data)
+
+    def finalize(self):
+        return self.stream.finalize()
+
+
+class CtrRandomAccess:
+    # Random access to the decrypted inflated IDAT stream (scanlines with their filter bytes) of a
+    # CTR-encrypted PNG: only the keystream blocks of the requested range are computed.
+    # With INDEX_CHUNK (band mode) inflating starts at the band holding the range, otherwise the
+    # stream is inflated from its start, which is cheap next to the keystream.
+    # png = buffer from open_png; chunk slices are kept, so it must stay open while the reader is used
+    def __init__(self, png, public_key, workers=None, cache=None):
+        self.public_key = public_key
+        self.workers = workers
+        self.cache = cache
+        self.ihdr = None
+        self.pixels = False
+        self.index = []
+        self.idat = []  # (offset in the zlib stream, chunk data)
+        compressed = 0
+        plte = b''
+        for chunk_type, chunk_data, crc in iter_chunks(png):
+            if chunk_type == b'IHDR':
+                self.ihdr = read_IHDR(chunk_data)
+            elif chunk_type == b'PLTE':
+                plte = chunk_data
+            elif chunk_type == PIXEL_CHUNK:
+                self.pixels = True
+            elif chunk_type == INDEX_CHUNK:
+                self.index = list(INDEX_ENTRY.iter_unpack(chunk_data))
+            elif chunk_type == b'IDAT':
+                self.idat.append((compressed, chunk_data))
+                compressed += len(chunk_data)
+        if self.ihdr is None:
+            raise ValueError("IHDR must be the first chunk")
+        self.palette = None
+        if self.pixels and self.ihdr['color_type'] == 3:
+            self.palette = palette_tables(len(plte) // 3, self.ihdr['bit_depth'])[1]
+        self.passes = scanline_passes(self.ihdr)
+        self.size = sum(rows * (row_bytes + 1) for rows, row_bytes in self.passes)
+        self.row_count = sum(rows for rows, row_bytes in self.passes)
+
+    def row_offset(self, row):
+        # Stream offset of the filter byte of a row; rows of all Adam7 passes are numbered in stream
+        # order, so rows 0 .. passes[0][0] are the first pass, a 1/8 x 1/8 preview of the image
+        offset = 0
+        for rows, row_bytes in self.passes:
+            if row < rows:
+                return offset + row * (row_bytes + 1)
+            offset += rows * (row_bytes + 1)
+            row -= rows
+        return offset
+
+    def read_rows(self, start, stop):
+        first = self.row_offset(start)
+        return self.read(first, self.row_offset(stop) - first)
+
+    def read(self, offset, length):
+        start, stop = max(0, offset), min(self.size, offset + length)
+        if start >= stop:
+            return b''
+        if not self.pixels:
+            data = self._inflate(start, stop)
+            keystream = generate_keystreams(self.public_key, [(start, len(data))], self.workers, cache=self.cache)[0]
+            return xor_bytes(data, keystream)
+        # Pixel mode skips filter bytes in the keystream, so decryption starts at a row boundary
+        row_start, pixel_offset, passes = self._row_at(start)
+        data = self._inflate(row_start, stop)
+        transform = PixelKeystreamXor(self.public_key, passes, self.workers, self.cache, pixel_offset, self.palette)
+        out = transform.update(data)
+        transform.finalize()
+        return bytes(out[start - row_start:])
+
+    def _row_at(self, position):
+        # (stream offset of the row holding position, its first pixel byte, layout from that row on)
+        start = pixel = 0
+        for index, (rows, row_bytes) in enumerate(self.passes):
+            size = rows * (row_bytes + 1)
+            if position < start + size:
+                row = (position - start) // (row_bytes + 1)
+                passes = [(rows - row, row_bytes)] + self.passes[index + 1:]
+                return start + row * (row_bytes + 1), pixel + row * row_bytes, passes
+            start += size
+            pixel += rows * row_bytes
+        return start, pixel, []
+
+    def _inflate(self, start, stop):
+        # Encrypted bytes [start, stop) of the inflated stream
+        position = compressed = 0
+        for inflated, offset, keystream in self.index:
+            if inflated > start:
+                break
+            position, compressed = inflated, offset
+        # A band starts right after a sync flush, so it can be inflated as raw deflate
+        raw = compressed > 0
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if raw else zlib.decompressobj()
+        out = bytearray()
+        for chunk_offset, chunk_data in self.idat:
+            if chunk_offset + len(chunk_data) <= compressed:
+                continue
+            data = chunk_data[max(0, compressed - chunk_offset):]
+            while data and position < stop:
+                piece = decompressor.decompress(data, min(stop - position, WINDOW_SIZE))
+                out += piece[max(0, start - position):]
+                position += len(piece)
+                if decompressor.eof:
+                    if raw:
+                        break
+                    # Older files have a separate zlib stream in every IDAT chunk
+                    data = decompressor.unused_data
+                    decompressor = zlib.decompressobj()
+                else:
+                    data = decompressor.unconsumed_tail
+            if position >= stop:
+                break
+        return out
+
+
+def read_ihdr(png):
+    chunk_type, chunk_data, crc = next(iter_chunks(png), (None, None, None))
+    if chunk_type != b'IHDR':
+        raise ValueError("IHDR must be the first chunk")
+    return read_IHDR(chunk_data)
+
+
+def find_chunk_before_idat(png, chunk_type):
+    # Data of the first chunk_type chunk before IDAT, None if there is none
+    for current_type, chunk_data, crc in iter_chunks(png):
+        if current_type == chunk_type:
+            return chunk_data
+        if current_type == b'IDAT':
+            return None
+    return None
+
+
+def has_chunk_before_idat(png, chunk_type):
+    return find_chunk_before_idat(png, chunk_type) is not None
+
+
+def palette_table(png, ihdr, decrypt=False):
+    # PixelKeystreamXor(palette=...) table of an indexed image, None for other colour types
+    if ihdr['color_type'] != 3:
+        return None
+    plte = find_chunk_before_idat(png, b'PLTE')
+    if not plte:
+        raise ValueError("PLTE must precede IDAT in an indexed image")
+    return palette_tables(len(plte) // 3, ihdr['bit_depth'])[decrypt]
+
+
+def modify_png_ctr_stream(source, public_key, dst, workers=None, collect=False, idat_chunk_size=IDAT_CHUNK_SIZE,
+                          verify_crc=False, cache=None, compress_level=-1, pixels=False, bands=False,
+                          band_size=BAND_SIZE, compression=None):
+    # source = path, bytes or binary file, dst = binary file opened for writing (e.g. io.BytesIO)
+    # cache = KeystreamCache shared between calls with the same key skips already computed keystream blocks
+    # compress_level = 0 stores the ciphertext in uncompressed zlib blocks (it does not compress anyway)
+    # pixels = True encrypts only pixel bytes row by row and keeps filter bytes, so the result is a valid PNG
+    # (palette indices are shifted modulo the PLTE size instead of XORed, see palette_tables)
+    # bands = True is the pixel mode with row bands of about band_size bytes encrypted and deflated in parallel
+    # (collect then returns the compressed IDAT stream); band offsets go to INDEX_CHUNK for CtrRandomAccess
+    # compression = deflate.Compression (level, strategy, threads) overrides compress_level; with bands only
+    # its level and strategy are used, the bands are already deflated in parallel by the process pool
+    with open_png(source) as src:
+        if bands:
+            ihdr = read_ihdr(src)
+            transform = PixelBandXor(public_key, scanline_passes(ihdr), workers, cache, band_size,
+                                     compression or Compression(compress_level), palette_table(src, ihdr))
+        elif pixels:
+            ihdr = read_ihdr(src)
+            transform = PixelKeystreamXor(public_key, scanline_passes(ihdr), workers, cache,
+                                          palette=palette_table(src, ihdr))
         else:
-            chunk_data = encrypted_chunk_data
+            transform = KeystreamXor(public_key, workers, cache)
+        insert_chunks = [(PIXEL_CHUNK, b'')] if pixels or bands else []
+        return transform_png(src, dst, transform, idat_chunk_size=idat_chunk_size, collect=collect,
+                             insert_chunks=insert_chunks, verify_crc=verify_crc, compress_level=compress_level,
+                             compress=not bands, compression=compression,
+                             append_chunks=transform.index_chunks if bands else None)
+
+
+def modify_png_ctr_bytes(data, public_key, *args, **kwargs):
+    # Same as modify_png_ctr_stream, returns the encrypted PNG as bytes
+    dst = io.BytesIO()
+    modify_png_ctr_stream(data, public_key, dst, *args, **kwargs)
+    return dst.getvalue()
+
+
+def modify_png_ctr(file_path, public_key, save_path, workers=None, collect=False, idat_chunk_size=IDAT_CHUNK_SIZE,
+                   verify_crc=False, cache=None, compress_level=-1, pixels=False, bands=False, band_size=BAND_SIZE,
+                   compression=None):
+    with open_output(save_path) as dst, open_png(file_path) as src:
+        return modify_png_ctr_stream(src, public_key, dst, workers, collect, idat_chunk_size, verify_crc, cache,
+                                     compress_level, pixels, bands, band_size, compression)
+
+
+def decrypt_and_reconstruct_png_ctr_stream(source, public_key, private_key, dst, workers=None,
+                                           idat_chunk_size=IDAT_CHUNK_SIZE, verify_crc=False, cache=None, bands=False,
+                                           band_size=BAND_SIZE, compression=None):
+    # Pixel-domain files are recognised by PIXEL_CHUNK; bands = True decrypts them in parallel row bands
+    with open_png(source) as src:
+        ihdr = read_ihdr(src)
+        pixels = has_chunk_before_idat(src, PIXEL_CHUNK)
+        palette = palette_table(src, ihdr, decrypt=True) if pixels else None
+        if bands and pixels:
+            transform = PixelBandXor(public_key, scanline_passes(ihdr), workers, cache, band_size, compression,
+                                     palette)
+            transform_png(src, dst, transform, idat_chunk_size=idat_chunk_size,
+                          consume_chunks={PIXEL_CHUNK: lambda chunk_data: None, INDEX_CHUNK: lambda chunk_data: None},
+                          verify_crc=verify_crc, compress=False)
+            return
+        decryptor = CtrDecryptor(public_key, ihdr, workers, cache, palette)
+        transform_png(src, dst, decryptor, idat_chunk_size=idat_chunk_size,
+                      consume_chunks={PIXEL_CHUNK: decryptor.use_pixels, INDEX_CHUNK: lambda chunk_data: None},
+                      verify_crc=verify_crc, compression=compression)
+
+
+def decrypt_and_reconstruct_png_ctr_bytes(data, public_key, private_key, *args, **kwargs):
+    # Same as decrypt_and_reconstruct_png_ctr_stream, returns the decrypted PNG as bytes
+    dst = io.BytesIO()
+    decrypt_and_reconstruct_png_ctr_stream(data, public_key, private_key, dst, *args, **kwargs)
+    return dst.getvalue()
+
+
+def decrypt_and_reconstruct_png_ctr(encrypted_png_path, public_key, private_key, decrypted_png_path, workers=None,
+                                    idat_chunk_size=IDAT_CHUNK_SIZE, verify_crc=False, cache=None, bands=False,
+                                    band_size=BAND_SIZE, compression=None):
+    with open_output(decrypted_png_path) as dst, open_png(encrypted_png_path) as src:
+        decrypt_and_reconstruct_png_ctr_stream(src, public_key, private_key, dst, workers, idat_chunk_size,
+                                               verify_crc, cache, bands, band_size, compression)
+
+
+def decrypt_png_ctr_range(source, public_key, offset, length, workers=None, cache=None):
+    # Bytes [offset, offset + length) of the decrypted inflated IDAT stream, without decrypting the rest
+    with open_png(source) as png:
+        return CtrRandomAccess(png, public_key, workers, cache).read(offset, length)
 
-        crc = zlib.crc32(chunk_type + chunk_data) & 0xffffffff
-        new_png_data += struct.pack('>I', chunk_len) + chunk_type + chunk_data + struct.pack('>I', crc)
 
-    with open(decrypted_png_path, 'wb') as file:
-        file.write(new_png_data)
+def decrypt_png_ctr_rows(source, public_key, start, stop, workers=None, cache=None):
+    # Decrypted scanlines start .. stop - 1 (each with its filter byte), e.g. a region of interest or,
+    # for Adam7 images, the first pass as a preview
+    with open_png(source) as png:
+        return CtrRandomAccess(png, public_key, workers, cache).read_rows(start, stop)
 
+if __name__ == "__main__":
+    public_key, private_key = load_or_generate_keys('rsa_1024.key', bits=1024)
+    cache = KeystreamCache()  # Decryption reuses the keystream computed during encryption
+    original_png_path = "example2.png"
+    encrypted_png_path = "encrypted_example.png"
+    decrypted_png_path = "decrypted_example.png"
 
-public_key, private_key = generate_rsa_keys(bits=1024)
-original_png_path = "example2.png"
-encrypted_png_path = "encrypted_example.png"
-decrypted_png_path = "decrypted_example.png"
+    print("Obraz oryginalny:")
+    display_image_from_bytes(read_png(original_png_path))
 
-print("Obraz oryginalny:")
-display_image_from_bytes(read_png(original_png_path))
+    encrypted_image_data = modify_png_ctr(original_png_path, public_key, encrypted_png_path, collect=True,
+                                          cache=cache)
+    decrypt_and_reconstruct_png_ctr(encrypted_png_path, public_key, private_key, decrypted_png_path, cache=cache)
 
-encrypted_image_data = modify_png_ctr(original_png_path, public_key, encrypted_png_path)
-decrypt_and_reconstruct_png_ctr(encrypted_png_path, public_key, private_key, decrypted_png_path)
+    print("Obraz zaszyfrowany:")
+    display_encrypted_image(encrypted_image_data)
 
-print("Obraz zaszyfrowany:")
-display_encrypted_image(encrypted_image_data)
+    print("Obraz odszyfrowany:")
+    display_image_from_bytes(read_png(decrypted_png_path))
 
-print("Obraz odszyfrowany:")
-display_image_from_bytes(read_png(decrypted_png_path))
+    # Pixel-domain mode keeps the PNG structure, so the encrypted file can be displayed directly
+    modify_png_ctr(original_png_path, public_key, encrypted_png_path, cache=cache, pixels=True)
+    print("Obraz zaszyfrowany w trybie pikseli:")
+    display_image_from_bytes(read_png(encrypted_png_path))
+    decrypt_and_reconstruct_png_ctr(encrypted_png_path, public_key, private_key, decrypted_png_path, cache=cache)
@@ -0,0 +1,143 @@
+import zlib
+from collections import deque
+
+ADLER_BASE = 65521
+WINDOW = 32 * 1024  # Okno deflate; tyle końcowych bajtów poprzedniego bloku służy za słownik następnego
+BLOCK_SIZE = 128 * 1024  # Blok danych kompresowany w osobnym wątku
+STRATEGIES = {
+    'default': zlib.Z_DEFAULT_STRATEGY,
+    'filtered': zlib.Z_FILTERED,
+    'huffman': zlib.Z_HUFFMAN_ONLY,
+    'rle': zlib.Z_RLE,
+    'fixed': zlib.Z_FIXED,
+}
+# Pusty ostatni blok deflate (BFINAL = 1, bloki stałe), zamyka strumień sklejony z kawałków
+FINAL_BLOCK = b'\x03\x00'
+
+
+def zlib_header(level=-1):
+    """Dwubajtowy nagłówek zlib (okno 32 KiB) z polem FLEVEL odpowiadającym poziomowi kompresji."""
+    return zlib.compress(b'', level)[:2]
+
+
+def deflate_piece(data, level=-1, strategy=zlib.Z_DEFAULT_STRATEGY, zdict=None):
+    """Kompresuje dane jako surowy deflate zakończony sync flush (wyrównanie do bajtu, bez bloku końcowego).
+
+    Bez zdict kawałki są niezależne (nie odwołują się do poprzednich danych), więc można je liczyć
+    równolegle i sklejać w dowolnej liczbie. zdict - końcówka poprzedniego kawałka jako słownik
+    (lepsza kompresja, kawałek nadal można liczyć równolegle, bo słownik to dane wejściowe).
+    """
+    if zdict:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zlib.DEF_MEM_LEVEL, strategy, zdict)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zlib.DEF_MEM_LEVEL, strategy)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def adler32_combine(adler1, adler2, length2):
+    """Adler-32 sklejenia dwóch ciągów z sum kontrolnych obu części (jak adler32_combine z zlib)."""
+    remainder = length2 % ADLER_BASE
+    sum1 = adler1 & 0xffff
+    sum2 = (remainder * sum1) % ADLER_BASE
+    sum1 = (sum1 + (adler2 & 0xffff) + ADLER_BASE - 1) % ADLER_BASE
+    sum2 = (sum2 + (adler1 >> 16) + (adler2 >> 16) + ADLER_BASE - remainder) % ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+
+class DeflateJoiner:
+    """Składa kawałki z deflate_piece w jeden poprawny strumień zlib (nagłówek, kawałki, blok końcowy, Adler-32)."""
+
+    def __init__(self, level=-1):
+        self.level = level
+        self.adler = 1
+        self.started = False
+
+    def add(self, piece, adler, length):
+        """Zwraca bajty do zapisania: kawałek, poprzedzony nagłówkiem zlib przy pierwszym wywołaniu."""
+        self.adler = adler32_combine(self.adler, adler, length)
+        if self.started:
+            return piece
+        self.started = True
+        return zlib_header(self.level) + piece
+
+    def finish(self):
+        out = b'' if self.started else zlib_header(self.level)
+        self.started = True
+        return out + FINAL_BLOCK + self.adler.to_bytes(4, 'big')
+
+
+class ParallelCompressor:
+    """Odpowiednik zlib.compressobj (compress/flush) kompresujący bloki po block_size bajtów w puli wątków.
+
+    zlib zwalnia GIL, więc wątki kompresują naprawdę równolegle; bloki są sklejane przez DeflateJoiner,
+    a ostatnie WINDOW bajtów bloku jest słownikiem następnego.
+    """
+
+    def __init__(self, level=-1, strategy=zlib.Z_DEFAULT_STRATEGY, threads=2, block_size=BLOCK_SIZE):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.level = level
+        self.strategy = strategy
+        self.threads = threads
+        self.block_size = block_size
+        self.joiner = DeflateJoiner(level)
+        self.buffer = bytearray()
+        self.dictionary = None
+        self.pending = deque()
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def _piece(self, block, zdict):
+        return deflate_piece(block, self.level, self.strategy, zdict), zlib.adler32(block), len(block)
+
+    def _submit(self, block):
+        self.pending.append(self.executor.submit(self._piece, block, self.dictionary))
+        self.dictionary = block[-WINDOW:]
+
+    def _collect(self, wait=False):
+        # Bloki sklejane są w kolejności, w locie najwyżej 2 * threads bloków
+        out = bytearray()
+        while self.pending and (wait or self.pending[0].done() or len(self.pending) > 2 * self.threads):
+            out += self.joiner.add(*self.pending.popleft().result())
+        return out
+
+    def compress(self, data):
+        self.buffer += data
+        pos = 0
+        while len(self.buffer) - pos >= self.block_size:
+            self._submit(bytes(self.buffer[pos:pos + self.block_size]))
+            pos += self.block_size
+        del self.buffer[:pos]
+        return self._collect()
+
+    def flush(self):
+        try:
+            if self.buffer:
+                self._submit(bytes(self.buffer))
+                self.buffer = bytearray()
+            out = self._collect(wait=True)
+        finally:
+            self.executor.shutdown()
+        return out + self.joiner.finish()
+
+
+class Compression:
+    """Ustawienia kompresji strumienia IDAT: poziom, strategia (nazwa z STRATEGIES lub stała zlib) i wątki.
+
+    threads = 1 - zwykły zlib.compressobj, threads > 1 - ParallelCompressor
+    (nieco większy plik, krótszy czas kompresji).
+    """
+
+    def __init__(self, level=-1, strategy='default', threads=1, block_size=BLOCK_SIZE):
+        if isinstance(strategy, str):
+            if strategy not in STRATEGIES:
+                raise ValueError(f"Nieznana strategia kompresji: {strategy} (dostępne: {', '.join(STRATEGIES)})")
+            strategy = STRATEGIES[strategy]
+        self.level = level
+        self.strategy = strategy
+        self.threads = threads
+        self.block_size = block_size
+
+    def compressobj(self):
+        if self.threads <= 1:
+            return zlib.compressobj(self.level, zlib.DEFLATED, zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, self.strategy)
+        return ParallelCompressor(self.level, self.strategy, self.threads, self.block_size)
@@ -0,0 +1,445 @@
+"""Parser EXIF (TIFF) dla chunka eXIf: wpisy IFD rozpakowywane hurtowo przez struct.iter_unpack,
+wartości dekodowane leniwie - dopiero przy odczycie danego tagu.
+
+Przechodzi łańcuch IFD0 -> IFD1 (miniatura) oraz podkatalogi Exif (34665), GPS (34853)
+i Interoperability (40965).
+"""
+import struct
+from collections.abc import Mapping
+
+# Wpis IFD: tag, typ, liczba elementów, 4 bajty wartości (albo przesunięcie do niej)
+ENTRY = {'<': struct.Struct('<HHL4s'), '>': struct.Struct('>HHL4s')}
+COUNT = {'<': struct.Struct('<H'), '>': struct.Struct('>H')}
+OFFSET = {'<': struct.Struct('<L'), '>': struct.Struct('>L')}
+
+# Typ TIFF: (format struct jednego elementu, rozmiar w bajtach)
+TYPES = {
+    1: ('B', 1),   # BYTE
+    2: ('s', 1),   # ASCII
+    3: ('H', 2),   # SHORT
+    4: ('L', 4),   # LONG
+    5: ('L', 8),   # RATIONAL (dwa LONG)
+    6: ('b', 1),   # SBYTE
+    7: ('s', 1),   # UNDEFINED
+    8: ('h', 2),   # SSHORT
+    9: ('l', 4),   # SLONG
+    10: ('l', 8),  # SRATIONAL (dwa SLONG)
+    11: ('f', 4),  # FLOAT
+    12: ('d', 8),  # DOUBLE
+    13: ('L', 4),  # IFD
+}
+
+# Pojedyncza wartość liczbowa (najczęstszy przypadek) - gotowe struktury dla obu kolejności bajtów
+SCALAR = {order: {type: struct.Struct(order + (2 * format if type in (5, 10) else format))
+                  for type, (format, _) in TYPES.items() if format != 's'}
+          for order in '<>'}
+
+EXIF_IFD = 34665
+GPS_IFD = 34853
+INTEROP_IFD = 40965
+
+TAGS = {
+    # IFD0 / IFD1 (TIFF)
+    11: "ProcessingSoftware",
+    254: "NewSubfileType",
+    255: "SubfileType",
+    256: "ImageWidth",
+    257: "ImageLength",
+    258: "BitsPerSample",
+    259: "Compression",
+    262: "PhotometricInterpretation",
+    263: "Thresholding",
+    264: "CellWidth",
+    265: "CellLength",
+    266: "FillOrder",
+    269: "DocumentName",
+    270: "ImageDescription",
+    271: "Make",
+    272: "Model",
+    273: "StripOffsets",
+    274: "Orientation",
+    277: "SamplesPerPixel",
+    278: "RowsPerStrip",
+    279: "StripByteCounts",
+    280: "MinSampleValue",
+    281: "MaxSampleValue",
+    282: "XResolution",
+    283: "YResolution",
+    284: "PlanarConfiguration",
+    285: "PageName",
+    286: "XPosition",
+    287: "YPosition",
+    290: "GrayResponseUnit",
+    291: "GrayResponseCurve",
+    292: "T4Options",
+    293: "T6Options",
+    296: "ResolutionUnit",
+    297: "PageNumber",
+    301: "TransferFunction",
+    305: "Software",
+    306: "DateTime",
+    315: "Artist",
+    316: "HostComputer",
+    317: "Predictor",
+    318: "WhitePoint",
+    319: "PrimaryChromaticities",
+    320: "ColorMap",
+    321: "HalftoneHints",
+    322: "TileWidth",
+    323: "TileLength",
+    324: "TileOffsets",
+    325: "TileByteCounts",
+    330: "SubIFDs",
+    332: "InkSet",
+    333: "InkNames",
+    334: "NumberOfInks",
+    336: "DotRange",
+    337: "TargetPrinter",
+    338: "ExtraSamples",
+    339: "SampleFormat",
+    340: "SMinSampleValue",
+    341: "SMaxSampleValue",
+    342: "TransferRange",
+    343: "ClipPath",
+    347: "JPEGTables",
+    512: "JPEGProc",
+    513: "JPEGInterchangeFormat",
+    514: "JPEGInterchangeFormatLength",
+    529: "YCbCrCoefficients",
+    530: "YCbCrSubSampling",
+    531: "YCbCrPositioning",
+    532: "ReferenceBlackWhite",
+    700: "XMLPacket",
+    18246: "Rating",
+    18249: "RatingPercent",
+    32781: "ImageID",
+    33421: "CFARepeatPatternDim",
+    33422: "CFAPattern",
+    33423: "BatteryLevel",
+    33432: "Copyright",
+    33434: "ExposureTime",
+    33437: "FNumber",
+    33723: "IPTCNAA",
+    34377: "ImageResources",
+    34665: "ExifOffset",
+    34675: "InterColorProfile",
+    34850: "ExposureProgram",
+    34852: "SpectralSensitivity",
+    34853: "GPSInfo",
+    34855: "ISOSpeedRatings",
+    34856: "OECF",
+    34857: "Interlace",
+    34858: "TimeZoneOffset",
+    34859: "SelfTimerMode",
+    34864: "SensitivityType",
+    34865: "StandardOutputSensitivity",
+    34866: "RecommendedExposureIndex",
+    34867: "ISOSpeed",
+    34868: "ISOSpeedLatitudeyyy",
+    34869: "ISOSpeedLatitudezzz",
+    # Podkatalog Exif
+    36864: "ExifVersion",
+    36867: "DateTimeOriginal",
+    36868: "DateTimeDigitized",
+    36880: "OffsetTime",
+    36881: "OffsetTimeOriginal",
+    36882: "OffsetTimeDigitized",
+    37121: "ComponentsConfiguration",
+    37122: "CompressedBitsPerPixel",
+    37377: "ShutterSpeedValue",
+    37378: "ApertureValue",
+    37379: "BrightnessValue",
+    37380: "ExposureBiasValue",
+    37381: "MaxApertureValue",
+    37382: "SubjectDistance",
+    37383: "MeteringMode",
+    37384: "LightSource",
+    37385: "Flash",
+    37386: "FocalLength",
+    37387: "FlashEnergy",
+    37388: "SpatialFrequencyResponse",
+    37389: "Noise",
+    37390: "FocalPlaneXResolution",
+    37391: "FocalPlaneYResolution",
+    37392: "FocalPlaneResolutionUnit",
+    37393: "ImageNumber",
+    37394: "SecurityClassification",
+    37395: "ImageHistory",
+    37396: "SubjectLocation",
+    37397: "ExposureIndex",
+    37398: "TIFFEPStandardID",
+    37399: "SensingMethod",
+    37500: "MakerNote",
+    37510: "UserComment",
+    37520: "SubsecTime",
+    37521: "SubsecTimeOriginal",
+    37522: "SubsecTimeDigitized",
+    37888: "AmbientTemperature",
+    37889: "Humidity",
+    37890: "Pressure",
+    37891: "WaterDepth",
+    37892: "Acceleration",
+    37893: "CameraElevationAngle",
+    40091: "XPTitle",
+    40092: "XPComment",
+    40093: "XPAuthor",
+    40094: "XPKeywords",
+    40095: "XPSubject",
+    40960: "FlashpixVersion",
+    40961: "ColorSpace",
+    40962: "ExifImageWidth",
+    40963: "ExifImageHeight",
+    40964: "RelatedSoundFile",
+    40965: "InteropOffset",
+    41483: "FlashEnergy",
+    41484: "SpatialFrequencyResponse",
+    41486: "FocalPlaneXResolution",
+    41487: "FocalPlaneYResolution",
+    41488: "FocalPlaneResolutionUnit",
+    41492: "SubjectLocation",
+    41493: "ExposureIndex",
+    41495: "SensingMethod",
+    41728: "FileSource",
+    41729: "SceneType",
+    41730: "CFAPattern",
+    41985: "CustomRendered",
+    41986: "ExposureMode",
+    41987: "WhiteBalance",
+    41988: "DigitalZoomRatio",
+    41989: "FocalLengthIn35mmFilm",
+    41990: "SceneCaptureType",
+    41991: "GainControl",
+    41992: "Contrast",
+    41993: "Saturation",
+    41994: "Sharpness",
+    41995: "DeviceSettingDescription",
+    41996: "SubjectDistanceRange",
+    42016: "ImageUniqueID",
+    42032: "CameraOwnerName",
+    42033: "BodySerialNumber",
+    42034: "LensSpecification",
+    42035: "LensMake",
+    42036: "LensModel",
+    42037: "LensSerialNumber",
+    42080: "CompositeImage",
+    42081: "SourceImageNumberOfCompositeImage",
+    42082: "SourceExposureTimesOfCompositeImage",
+    42240: "Gamma",
+    50341: "PrintImageMatching",
+    50706: "DNGVersion",
+    50707: "DNGBackwardVersion",
+    50708: "UniqueCameraModel",
+    50709: "LocalizedCameraModel",
+    50721: "ColorMatrix1",
+    50722: "ColorMatrix2",
+    50727: "AnalogBalance",
+    50728: "AsShotNeutral",
+    50730: "BaselineExposure",
+    50778: "CalibrationIlluminant1",
+    50779: "CalibrationIlluminant2",
+    50781: "RawDataUniqueID",
+    50827: "OriginalRawFileName",
+    50931: "CameraCalibrationSignature",
+    50932: "ProfileCalibrationSignature",
+    50936: "ProfileName",
+    50941: "ProfileEmbedPolicy",
+    50942: "ProfileCopyright",
+    59932: "Padding",
+    59933: "OffsetSchema",
+}
+
+GPS_TAGS = {
+    0: "GPSVersionID",
+    1: "GPSLatitudeRef",
+    2: "GPSLatitude",
+    3: "GPSLongitudeRef",
+    4: "GPSLongitude",
+    5: "GPSAltitudeRef",
+    6: "GPSAltitude",
+    7: "GPSTimeStamp",
+    8: "GPSSatellites",
+    9: "GPSStatus",
+    10: "GPSMeasureMode",
+    11: "GPSDOP",
+    12: "GPSSpeedRef",
+    13: "GPSSpeed",
+    14: "GPSTrackRef",
+    15: "GPSTrack",
+    16: "GPSImgDirectionRef",
+    17: "GPSImgDirection",
+    18: "GPSMapDatum",
+    19: "GPSDestLatitudeRef",
+    20: "GPSDestLatitude",
+    21: "GPSDestLongitudeRef",
+    22: "GPSDestLongitude",
+    23: "GPSDestBearingRef",
+    24: "GPSDestBearing",
+    25: "GPSDestDistanceRef",
+    26: "GPSDestDistance",
+    27: "GPSProcessingMethod",
+    28: "GPSAreaInformation",
+    29: "GPSDateStamp",
+    30: "GPSDifferential",
+    31: "GPSHPositioningError",
+}
+
+INTEROP_TAGS = {
+    1: "InteropIndex",
+    2: "InteropVersion",
+    4096: "RelatedImageFileFormat",
+    4097: "RelatedImageWidth",
+    4098: "RelatedImageLength",
+}
+
+# Wskaźnik na podkatalog: (nazwa katalogu, tablica nazw jego tagów)
+SUB_IFDS = {
+    EXIF_IFD: ('Exif', TAGS),
+    GPS_IFD: ('GPS', GPS_TAGS),
+    INTEROP_IFD: ('Interop', INTEROP_TAGS),
+}
+
+
+def translate_tag(tag_number, names=TAGS):
+    """Nazwa tagu albo sam numer, jeśli tag jest nieznany."""
+    return names.get(tag_number, tag_number)
+
+
+class Ifd(Mapping):
+    """Jeden katalog IFD jako słownik {numer tagu: wartość}.
+
+    Przy tworzeniu rozpakowywane są tylko 12-bajtowe wpisy (jednym iter_unpack);
+    wartość tagu jest dekodowana przy pierwszym odczycie i zapamiętywana.
+    """
+
+    def __init__(self, data, offset, order, names=TAGS):
+        self.data = data
+        self.order = order
+        self.names = names
+        count = COUNT[order].unpack_from(data, offset)[0]
+        start = offset + 2
+        # Uszkodzony katalog: tylko wpisy mieszczące się w danych
+        count = min(count, (len(data) - start) // 12)
+        end = start + 12 * count
+        self.entries = {tag: (type, length, field) for tag, type, length, field
+                        in ENTRY[order].iter_unpack(data[start:end])}
+        self.next_offset = OFFSET[order].unpack_from(data, end)[0] if end + 4 <= len(data) else 0
+        self._values = {}
+
+    def __getitem__(self, tag):
+        if tag not in self._values:
+            self._values[tag] = self._decode(*self.entries[tag])
+        return self._values[tag]
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def name(self, tag):
+        return translate_tag(tag, self.names)
+
+    def named(self):
+        """Lista (nazwa tagu, wartość) w kolejności wpisów; dekoduje wszystkie wartości."""
+        return [(self.name(tag), self[tag]) for tag in self.entries]
+
+    def raw(self, tag):
+        """Bajty wartości tagu bez dekodowania."""
+        type, length, field = self.entries[tag]
+        return self._raw(TYPES.get(type, ('s', 1))[1] * length, field)
+
+    def _raw(self, size, field):
+        if size <= 4:
+            return field[:size]
+        offset = OFFSET[self.order].unpack(field)[0]
+        return bytes(self.data[offset:offset + size])
+
+    def _decode(self, type, length, field):
+        if type not in TYPES:
+            return field
+        format, size = TYPES[type]
+        raw = self._raw(size * length, field)
+        if type == 2:
+            return raw.decode(errors='replace').rstrip('\x00')
+        if type in (1, 7):
+            return raw
+        if length == 1 and len(raw) == size:
+            value = SCALAR[self.order][type].unpack(raw)
+            if type in (5, 10):
+                return value[0] / value[1] if value[1] else None
+            return value[0]
+        length = len(raw) // size  # Wartość ucięta na końcu danych
+        if type in (5, 10):
+            parts = struct.unpack(f'{self.order}{2 * length}{format}', raw[:size * length])
+            values = tuple(num / den if den else None for num, den in zip(parts[::2], parts[1::2]))
+        else:
+            values = struct.unpack(f'{self.order}{length}{format}', raw[:size * length])
+        return values[0] if len(values) == 1 else values
+
+
+class Exif:
+    """Cały blok EXIF: katalogi w kolejności przejścia jako lista (nazwa, Ifd).
+
+    Nazwy: IFD0, IFD1, ... dla łańcucha głównego oraz Exif, GPS, Interop dla podkatalogów.
+    """
+
+    def __init__(self, data):
+        if data[:6] == b'Exif\x00\x00':
+            data = data[6:]  # Nagłówek APP1 z JPEG, który część programów zapisuje także w eXIf
+        if data[:2] == b'II':
+            self.order = '<'
+        elif data[:2] == b'MM':
+            self.order = '>'
+        else:
+            raise ValueError("Nieprawidłowy nagłówek TIFF w danych EXIF")
+        self.data = memoryview(data)
+        self.ifds = []
+        offset = OFFSET[self.order].unpack_from(data, 4)[0] if len(data) >= 8 else 0
+        self._walk(offset or 8)
+
+    def _walk(self, offset):
+        visited = set()
+        pending = [(offset, 'IFD0', TAGS)]
+        chain = 0
+        while pending:
+            offset, name, names = pending.pop(0)
+            # Zapętlone lub wskazujące poza dane przesunięcia są pomijane
+            if offset in visited or not 8 <= offset <= len(self.data) - 2:
+                continue
+            visited.add(offset)
+            ifd = Ifd(self.data, offset, self.order, names)
+            self.ifds.append((name, ifd))
+            for tag, (sub_name, sub_names) in SUB_IFDS.items():
+                if tag in ifd.entries and names is TAGS:
+                    pointer = ifd[tag]
+                    if isinstance(pointer, int):
+                        pending.append((pointer, sub_name, sub_names))
+            if name.startswith('IFD') and ifd.next_offset:
+                chain += 1
+                pending.append((ifd.next_offset, f'IFD{chain}', TAGS))
+
+    def __getitem__(self, name):
+        for ifd_name, ifd in self.ifds:
+            if ifd_name == name:
+                return ifd
+        raise KeyError(name)
+
+    def find(self, tag, default=None):
+        """Wartość tagu (numer lub nazwa) z pierwszego katalogu, który go zawiera."""
+        for _, ifd in self.ifds:
+            for number in ifd.entries:
+                if number == tag or ifd.name(number) == tag:
+                    return ifd[number]
+        return default
+
+    def named(self):
+        """Wszystkie tagi jako płaska lista (nazwa, wartość), katalog po katalogu."""
+        return [entry for _, ifd in self.ifds for entry in ifd.named()]
+
+
+def read_exif(data):
+    """Tagi EXIF jako lista (nazwa, wartość) albo None, gdy dane nie są blokiem TIFF."""
+    try:
+        return Exif(data).named()
+    except ValueError:
+        return None
@@ -1,9 +1,5 @@
-from sympy import randprime, isprime
-import random
+import secrets
 import math
-import matplotlib.pyplot as plt
-from PIL import Image
-import numpy as np
 import io
 
 def read_png(file_path):
@@ -11,19 +7,80 @@ def read_png(file_path):
         data = file.read()
     return data
 
-def generate_rsa_keys(bits=1024):
-    p = randprime(2**(bits//2 - 1), 2**(bits//2))
-    q = randprime(2**(bits//2 - 1), 2**(bits//2))
+class RSAPrivateKey(tuple):
+    """Klucz prywatny RSA (d, n) z parametrami CRT: p, q, dP, dQ, qInv."""
+
+    def __new__(cls, d, n, p, q):
+        key = super().__new__(cls, (d, n))
+        key.p = p
+        key.q = q
+        key.dP = d % (p - 1)
+        key.dQ = d % (q - 1)
+        key.qInv = pow(q, -1, p)
+        return key
+
+    def __getnewargs__(self):
+        return self[0], self[1], self.p, self.q
+
+def _small_primes(limit):
+    sieve = bytearray([1]) * limit
+    sieve[0:2] = b'\x00\x00'
+    for i in range(2, int(limit ** 0.5) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytes(len(range(i * i, limit, i)))
+    return [i for i in range(limit) if sieve[i]]
+
+SMALL_PRIMES = _small_primes(2000)
+PUBLIC_EXPONENT = 65537
+
+def is_probable_prime(n, rounds=40):
+    # Dzielenie przez małe liczby pierwsze, potem test Millera-Rabina
+    if n < 2:
+        return False
+    for prime in SMALL_PRIMES:
+        if n % prime == 0:
+            return n == prime
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for _ in range(rounds):
+        a = secrets.randbelow(n - 3) + 2
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+def generate_prime(bits, e=PUBLIC_EXPONENT):
+    # Dwa najstarsze bity ustawione, więc iloczyn dwóch liczb ma dokładnie 2 * bits bitów.
+    # Kandydaci to kolejne liczby nieparzyste; małe dzielniki odsiewane są na resztach.
+    while True:
+        start = secrets.randbits(bits) | (3 << (bits - 2)) | 1
+        residues = [start % prime for prime in SMALL_PRIMES]
+        for delta in range(0, 2 * bits * 32, 2):
+            candidate = start + delta
+            if candidate.bit_length() != bits:
+                break
+            if any((residue + delta) % prime == 0 for residue, prime in zip(residues, SMALL_PRIMES)):
+                continue
+            if math.gcd(e, candidate - 1) == 1 and is_probable_prime(candidate):
+                return candidate
+
+def generate_rsa_keys(bits=1024, e=PUBLIC_EXPONENT):
+    p = generate_prime(bits // 2, e)
+    q = generate_prime(bits - bits // 2, e)
     while p == q:
-        q = randprime(2**(bits//2 - 1), 2**(bits//2))
+        q = generate_prime(bits - bits // 2, e)
     n = p * q
     phi = (p - 1) * (q - 1)
-    while True:
-        e = random.randint(2, phi-1)
-        if math.gcd(e,phi)==1:
-            break
     d = pow(e, -1, phi)
-    return (e, n), (d, n)
+    return (e, n), RSAPrivateKey(d, n, p, q)
 
 def add_padding(data, block_size):
     padding_length = block_size - (len(data) % block_size)
@@ -34,13 +91,22 @@ def remove_padding(data):
     padding_length = data[-1]
     return data[:-padding_length]
 
+# matplotlib, PIL i numpy ładowane są dopiero przy wyświetlaniu, żeby import
+# modułów szyfrujących był szybki
+
 def display_image_from_bytes(data_bytes):
+    import matplotlib.pyplot as plt
+    from PIL import Image
+
     img = Image.open(io.BytesIO(data_bytes))
     plt.imshow(img)
     plt.axis('off')
     plt.show()
 
 def display_encrypted_image(data_bytes):
+    import matplotlib.pyplot as plt
+    import numpy as np
+
     if len(data_bytes) == 0:
         print("Brak danych do wyświetlenia. Możliwe, że zaszyfrowane dane są puste lub uszkodzone.")
         return
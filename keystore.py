@@ -0,0 +1,66 @@
+import os
+import struct
+
+from helper_functions import RSAPrivateKey, generate_rsa_keys
+
+# Format pliku: MAGIC, wersja, liczba pól, potem każde pole jako długość (4 bajty) + liczba big-endian.
+# Pola: e, n, d, p, q (dP, dQ i qInv liczone są przy wczytaniu).
+KEYSTORE_MAGIC = b'RSAK'
+KEYSTORE_VERSION = 1
+
+
+def save_keys(path, public_key, private_key):
+    """Zapisuje parę kluczy do pliku binarnego (atomowo, z prawami 0600)."""
+    e, n = public_key
+    d, _ = private_key
+    fields = [e, n, d, private_key.p, private_key.q]
+    data = bytearray(KEYSTORE_MAGIC)
+    data += struct.pack('>BB', KEYSTORE_VERSION, len(fields))
+    for value in fields:
+        raw = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+        data += struct.pack('>I', len(raw)) + raw
+
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+def load_keys(path):
+    """Wczytuje parę kluczy zapisaną przez save_keys."""
+    with open(path, 'rb') as file:
+        data = file.read()
+    if data[:4] != KEYSTORE_MAGIC:
+        raise ValueError(f"{path} nie jest plikiem z kluczami RSA")
+    version, count = struct.unpack_from('>BB', data, 4)
+    if version != KEYSTORE_VERSION or count != 5:
+        raise ValueError(f"Nieobsługiwana wersja pliku z kluczami: {version}")
+    pos = 6
+    fields = []
+    for _ in range(count):
+        length, = struct.unpack_from('>I', data, pos)
+        pos += 4
+        fields.append(int.from_bytes(data[pos:pos + length], 'big'))
+        pos += length
+    e, n, d, p, q = fields
+    if p * q != n:
+        raise ValueError(f"{path}: uszkodzony plik z kluczami")
+    return (e, n), RSAPrivateKey(d, n, p, q)
+
+
+def load_or_generate_keys(path, bits=None):
+    """Wczytuje klucze z pliku albo generuje nowe (bits, domyślnie 1024) i zapisuje je do ponownego użycia.
+
+    Istniejący plik nigdy nie jest nadpisywany: gdy bits podano, a klucz w pliku ma inny rozmiar,
+    zgłaszany jest ValueError (nowy klucz uniemożliwiłby odszyfrowanie starych obrazów).
+    """
+    if os.path.exists(path):
+        public_key, private_key = load_keys(path)
+        size = public_key[1].bit_length()
+        if bits is not None and size != bits:
+            raise ValueError(f"{path} zawiera klucz {size}-bitowy, a nie {bits}-bitowy")
+        return public_key, private_key
+    public_key, private_key = generate_rsa_keys(bits or 1024)
+    save_keys(path, public_key, private_key)
+    return public_key, private_key
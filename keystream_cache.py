@@ -0,0 +1,135 @@
+import hashlib
+import mmap
+import os
+from collections import OrderedDict
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_SEGMENT_BLOCKS = 256  # Bloków keystreamu w jednym wpisie cache
+# Wersja zawartości plików dysku; zmiana licznika CTR (E(i) od i = 0 -> ctr.counter_base) unieważnia stare pliki
+DISK_FORMAT = 2
+
+
+def _key_id(public_key):
+    e, n = public_key
+    return hashlib.sha256(f"{e}:{n}".encode()).hexdigest()[:32]
+
+
+class DiskKeystreamStore:
+    """Keystream na dysku: plik <id klucza>.ks z segmentami pod stałymi offsetami, mapowany przez mmap.
+
+    Obok leży plik .idx z jednym bajtem na segment (1 - segment zapisany).
+    """
+
+    def __init__(self, directory, segment_bytes):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.files = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self, public_key):
+        key_id = _key_id(public_key)
+        if key_id not in self.files:
+            base = os.path.join(self.directory, f"{key_id}-{self.segment_bytes}-v{DISK_FORMAT}")
+            data_fd = os.open(base + '.ks', os.O_RDWR | os.O_CREAT, 0o600)
+            index_fd = os.open(base + '.idx', os.O_RDWR | os.O_CREAT, 0o600)
+            index = bytearray(os.pread(index_fd, os.fstat(index_fd).st_size, 0))
+            self.files[key_id] = {'data': data_fd, 'index_fd': index_fd, 'index': index, 'map': None}
+        return self.files[key_id]
+
+    def get(self, public_key, segment):
+        entry = self._open(public_key)
+        if segment >= len(entry['index']) or not entry['index'][segment]:
+            return None
+        end = (segment + 1) * self.segment_bytes
+        if entry['map'] is None or len(entry['map']) < end:
+            if entry['map'] is not None:
+                entry['map'].close()
+            entry['map'] = mmap.mmap(entry['data'], 0, access=mmap.ACCESS_READ)
+        return entry['map'][segment * self.segment_bytes:end]
+
+    def put(self, public_key, segment, data):
+        entry = self._open(public_key)
+        os.pwrite(entry['data'], data, segment * self.segment_bytes)
+        index = entry['index']
+        if segment >= len(index):
+            index.extend(bytes(segment + 1 - len(index)))
+        index[segment] = 1
+        os.pwrite(entry['index_fd'], b'\x01', segment)
+
+    def close(self):
+        for entry in self.files.values():
+            if entry['map'] is not None:
+                entry['map'].close()
+            os.close(entry['data'])
+            os.close(entry['index_fd'])
+        self.files.clear()
+
+
+class KeystreamCache:
+    """Cache segmentów keystreamu CTR kluczowany (e, n, numer segmentu).
+
+    Pierwszy poziom to LRU w pamięci z limitem max_bytes, drugi (opcjonalny) to DiskKeystreamStore.
+    Segment to segment_blocks kolejnych bloków keystreamu, czyli E(ctr.counter_base(n) + i)
+    dla i od segment * segment_blocks.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, segment_blocks=DEFAULT_SEGMENT_BLOCKS, directory=None):
+        self.max_bytes = max_bytes
+        self.segment_blocks = segment_blocks
+        self.directory = directory
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.disk_stores = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _disk(self, public_key):
+        if self.directory is None:
+            return None
+        segment_bytes = self.segment_blocks * ((public_key[1].bit_length() + 7) // 8)
+        if segment_bytes not in self.disk_stores:
+            self.disk_stores[segment_bytes] = DiskKeystreamStore(self.directory, segment_bytes)
+        return self.disk_stores[segment_bytes]
+
+    def get(self, public_key, segment):
+        key = (public_key[0], public_key[1], segment)
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return data
+        disk = self._disk(public_key)
+        data = disk.get(public_key, segment) if disk is not None else None
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(key, data)
+        return data
+
+    def put(self, public_key, segment, data):
+        data = bytes(data)
+        self._remember((public_key[0], public_key[1], segment), data)
+        disk = self._disk(public_key)
+        if disk is not None:
+            disk.put(public_key, segment, data)
+
+    def _remember(self, key, data):
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key))
+        if len(data) > self.max_bytes:
+            return
+        self.memory[key] = data
+        self.memory_bytes += len(data)
+        while self.memory_bytes > self.max_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+
+    def clear(self):
+        self.memory.clear()
+        self.memory_bytes = 0
+
+    def close(self):
+        for disk in self.disk_stores.values():
+            disk.close()
+        self.disk_stores.clear()
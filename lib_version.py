@@ -1,119 +1,297 @@
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import hashes, serialization
-import zlib
-import struct
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+import io
+import os
 from helper_functions import *
+from keystore import load_or_generate_keys
+from parallel import close_after
+from png_stream import open_png, open_output, BlockStream, IDAT_CHUNK_SIZE, transform_png
 
-def rsa_encrypt(data, public_key):
-    """Szyfruje dane przy użyciu publicznego klucza RSA."""
-    encrypted_data = bytearray()
-    max_block_size = (public_key.key_size // 8) - 2 - 2 * hashes.SHA256.digest_size
-    for i in range(0, len(data), max_block_size):
-        block = data[i:i + max_block_size]
-        encrypted_data += public_key.encrypt(
-            block,
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
-            )
-        )
-    return bytes(encrypted_data)
-
-def rsa_decrypt(data, private_key):
-    """Deszyfruje dane przy użyciu prywatnego klucza RSA."""
-    decrypted_data = bytearray()
-    block_size = private_key.key_size // 8
-    for i in range(0, len(data), block_size):
-        block = data[i:i + block_size]
-        decrypted_data += private_key.decrypt(
-            block,
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
-            )
-        )
-    return bytes(decrypted_data)
-
-def modify_png(file_path, public_key, save_path, mode=0):
-    """Modyfikuje plik PNG, szyfrując bloki danych IDAT."""
-    with open(file_path, 'rb') as file:
-        data = file.read()
-    new_png_data = bytearray(data[:8])
-    pos = 8
-    encrypted_image_data = bytearray()
-    while pos < len(data):
-        chunk_len = struct.unpack('>I', data[pos:pos + 4])[0]
-        chunk_type = data[pos+4:pos + 8]
-        chunk_data = data[pos+8:pos + 8 + chunk_len]
-        pos += 12 + chunk_len
-        if chunk_type == b'IDAT':
-            decompressed_data = zlib.decompress(chunk_data) if mode == 0 else chunk_data
-            padded_data = add_padding(decompressed_data, (public_key.key_size // 8) - 2 - 2 * hashes.SHA256.digest_size)
-            encrypted_data = rsa_encrypt(padded_data, public_key)
-            encrypted_image_data.extend(encrypted_data)
-            chunk_data = zlib.compress(encrypted_data) if mode == 0 else encrypted_data
-            chunk_len = len(chunk_data)
-        crc = zlib.crc32(chunk_type + chunk_data) & 0xffffffff
-        new_png_data += struct.pack('>I', chunk_len)
-        new_png_data += chunk_type
-        new_png_data += chunk_data
-        new_png_data += struct.pack('>I', crc)
-    with open(save_path, 'wb') as file:
-        file.write(new_png_data)
-    return encrypted_image_data
-
-def decrypt_and_reconstruct_png(encrypted_png_path, private_key, decrypted_png_path, mode=0):
-    """Odszyfrowuje i rekonstruuje plik PNG."""
-    with open(encrypted_png_path, 'rb') as file:
-        data = file.read()
-    new_png_data = bytearray(data[:8])
-    pos = 8
-    while pos < len(data):
-        chunk_len = struct.unpack('>I', data[pos:pos + 4])[0]
-        chunk_type = data[pos+4:pos + 8]
-        encrypted_chunk_data = data[pos+8:pos + 8 + chunk_len]
-        pos += 12 + chunk_len
-        if chunk_type == b'IDAT':
-            encrypted_data = zlib.decompress(encrypted_chunk_data) if mode == 0 else encrypted_chunk_data
-            decrypted_data = rsa_decrypt(encrypted_data, private_key)
-            padded_decrypted_data = remove_padding(decrypted_data)
-            chunk_data = zlib.compress(padded_decrypted_data) if mode == 0 else padded_decrypted_data
-            chunk_len = len(chunk_data)
-        else:
-            chunk_data = encrypted_chunk_data
-        crc = zlib.crc32(chunk_type + chunk_data) & 0xffffffff
-        new_png_data += struct.pack('>I', chunk_len)
-        new_png_data += chunk_type
-        new_png_data += chunk_data
-        new_png_data += struct.pack('>I', crc)
-    with open(decrypted_png_path, 'wb') as file:
-        file.write(new_png_data)
-
-# Generowanie kluczy RSA
-public_key, private_key = generate_rsa_keys()
-original_png_path = 'example2.png'
-encrypted_png_path = 'enc_example.png'
-decrypted_png_path = 'dec_example.png'
-
-# Wyświetlanie oryginalnego obrazu
-print("Obraz oryginalny:")
-display_image_from_bytes(read_png(original_png_path))
-
-for mode in range(2):
-    # Szyfrowanie pliku PNG
-    print(f"Szyfrowanie pliku PNG z mode={mode}...")
-    encrypted_image_data = modify_png(original_png_path, public_key, encrypted_png_path, mode)
-
-    # Deszyfrowanie pliku PNG
-    print(f"Deszyfrowanie pliku PNG z mode={mode}...")
-    decrypt_and_reconstruct_png(encrypted_png_path, private_key, decrypted_png_path, mode)
-
-    # Wyświetlanie zaszyfrowanego obrazu
-    print(f"Wyświetlanie zaszyfrowanego obrazu z mode={mode}:")
-    display_encrypted_image(encrypted_image_data)
-
-    # Wyświetlanie odszyfrowanego obrazu
-    print(f"Wyświetlanie odszyfrowanego obrazu z mode={mode}:")
-    display_image_from_bytes(read_png(decrypted_png_path))
+# Prywatny chunk z kluczem sesji: id algorytmu, nonce, klucz zaszyfrowany OAEP
+KEY_CHUNK = b'rsKY'
+AES_GCM = 1
+GCM_NONCE_SIZE = 12
+GCM_TAG_SIZE = 16
+
+def oaep_padding():
+    return padding.OAEP(
+        mgf=padding.MGF1(algorithm=hashes.SHA256()),
+        algorithm=hashes.SHA256(),
+        label=None
+    )
+
+def to_cryptography_keys(public_key, private_key):
+    """Zamienia klucze (e, n) i RSAPrivateKey na klucze biblioteki cryptography."""
+    e, n = public_key
+    d, _ = private_key
+    private_numbers = rsa.RSAPrivateNumbers(
+        private_key.p, private_key.q, d,
+        private_key.dP, private_key.dQ, private_key.qInv,
+        rsa.RSAPublicNumbers(e, n)
+    )
+    cryptography_private_key = private_numbers.private_key()
+    return cryptography_private_key.public_key(), cryptography_private_key
+
+# Bloków OAEP w jednej paczce przekazywanej do wątku
+OAEP_BATCH_BLOCKS = 64
+# Poniżej tej liczby bloków praca zostaje w bieżącym wątku
+MIN_THREADED_BLOCKS = 2 * OAEP_BATCH_BLOCKS
+
+def oaep_block_size(key):
+    """Największy blok danych, który mieści się w jednym szyfrogramie OAEP (SHA-256)."""
+    return (key.key_size // 8) - 2 - 2 * hashes.SHA256.digest_size
+
+class OaepCipher:
+    """Szyfrowanie i deszyfrowanie blokami OAEP w puli wątków.
+
+    OpenSSL zwalnia GIL na czas operacji RSA, więc paczki bloków liczone są w wątkach naprawdę
+    równolegle, bez kosztu uruchamiania procesów. Obiekt paddingu tworzony jest raz, a paczki
+    zapisują wyniki w przygotowanym z góry buforze wyjściowym.
+    threads = None - liczba rdzeni; pula powstaje dopiero przy pierwszych dużych danych.
+    """
+
+    def __init__(self, key, threads=None, batch_blocks=OAEP_BATCH_BLOCKS):
+        self.key = key
+        self.threads = threads or os.cpu_count() or 1
+        self.batch_blocks = batch_blocks
+        self.padding = oaep_padding()
+        self.cipher_size = key.key_size // 8
+        self.plain_size = oaep_block_size(key)
+        self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def _run(self, batch, count):
+        # batch(start, stop) przetwarza bloki [start, stop)
+        if self.threads <= 1 or count < MIN_THREADED_BLOCKS:
+            return [batch(0, count)]
+        if self.executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        step = self.batch_blocks
+        return list(self.executor.map(batch, range(0, count, step),
+                                      [min(start + step, count) for start in range(0, count, step)]))
+
+    def encrypt(self, data):
+        count = -(-len(data) // self.plain_size)
+        out = bytearray(count * self.cipher_size)
+        data = memoryview(data)
+        encrypt, padding, plain_size, cipher_size = self.key.encrypt, self.padding, self.plain_size, self.cipher_size
+
+        def batch(start, stop):
+            for i in range(start, stop):
+                block = bytes(data[i * plain_size:(i + 1) * plain_size])
+                out[i * cipher_size:(i + 1) * cipher_size] = encrypt(block, padding)
+
+        self._run(batch, count)
+        return bytes(out)
+
+    def decrypt(self, data):
+        count = -(-len(data) // self.cipher_size)
+        out = bytearray(count * self.plain_size)
+        data = memoryview(data)
+        decrypt, padding, plain_size, cipher_size = self.key.decrypt, self.padding, self.plain_size, self.cipher_size
+
+        def batch(start, stop):
+            # Zwraca numery i długości bloków krótszych niż plain_size (np. z obcego szyfrogramu)
+            short = []
+            for i in range(start, stop):
+                block = decrypt(bytes(data[i * cipher_size:(i + 1) * cipher_size]), padding)
+                out[i * plain_size:i * plain_size + len(block)] = block
+                if len(block) != plain_size:
+                    short.append((i, len(block)))
+            return short
+
+        short = [entry for entries in self._run(batch, count) for entry in entries]
+        if not short:
+            return bytes(out)
+        # Rzadki przypadek: sklejenie z pominięciem niewykorzystanych końcówek krótkich bloków
+        lengths = dict(short)
+        with memoryview(out) as view:
+            return b''.join(view[i * plain_size:i * plain_size + lengths.get(i, plain_size)] for i in range(count))
+
+def rsa_encrypt(data, public_key, threads=None):
+    """Szyfruje dane przy użyciu publicznego klucza RSA (threads > 1 - paczki bloków w puli wątków)."""
+    with OaepCipher(public_key, threads) as cipher:
+        return cipher.encrypt(data)
+
+def rsa_decrypt(data, private_key, threads=None):
+    """Deszyfruje dane przy użyciu prywatnego klucza RSA (threads > 1 - paczki bloków w puli wątków)."""
+    with OaepCipher(private_key, threads) as cipher:
+        return cipher.decrypt(data)
+
+def rsa_encryptor(public_key, threads=None):
+    """Strumień szyfrujący dane IDAT, padding dodawany tylko na końcu strumienia."""
+    cipher = OaepCipher(public_key, threads)
+    block_size = cipher.plain_size
+    return BlockStream(cipher.encrypt, block_size,
+                       close_after(cipher, lambda rest: cipher.encrypt(add_padding(rest, block_size))))
+
+def rsa_decryptor(private_key, threads=None):
+    """Strumień deszyfrujący dane IDAT, ostatni blok (z paddingiem) czeka do końca."""
+    cipher = OaepCipher(private_key, threads)
+    return BlockStream(cipher.decrypt, cipher.cipher_size,
+                       close_after(cipher, lambda rest: remove_padding(cipher.decrypt(rest))), keep_last=True)
+
+class GCMEncryptStream:
+    """Szyfruje strumień IDAT przez AES-256-GCM, tag dopisywany jest na końcu."""
+
+    def __init__(self, key, nonce):
+        self.encryptor = Cipher(algorithms.AES(key), modes.GCM(nonce)).encryptor()
+
+    def update(self, data):
+        return self.encryptor.update(data)
+
+    def finalize(self):
+        return self.encryptor.finalize() + self.encryptor.tag
+
+class GCMDecryptStream:
+    """Deszyfruje strumień AES-256-GCM, ostatnie GCM_TAG_SIZE bajtów to tag.
+
+    update zwraca dane przed uwierzytelnieniem; są poprawne dopiero, gdy finalize nie zgłosi InvalidTag.
+    """
+
+    def __init__(self, key, nonce):
+        self.decryptor = Cipher(algorithms.AES(key), modes.GCM(nonce)).decryptor()
+        self.tail = b''
+
+    def update(self, data):
+        data = self.tail + data
+        self.tail = data[-GCM_TAG_SIZE:]
+        return self.decryptor.update(data[:-GCM_TAG_SIZE])
+
+    def finalize(self):
+        return self.decryptor.finalize_with_tag(self.tail)
+
+class HybridDecryptor:
+    """Deszyfruje IDAT kluczem sesji z chunka KEY_CHUNK, a bez niego blokami OAEP."""
+
+    def __init__(self, private_key, threads=None):
+        self.private_key = private_key
+        self.threads = threads
+        self.stream = None
+
+    def load_key(self, chunk_data):
+        if chunk_data[0] != AES_GCM:
+            raise ValueError(f"Nieznany algorytm szyfrowania: {chunk_data[0]}")
+        nonce = bytes(chunk_data[1:1 + GCM_NONCE_SIZE])
+        key = self.private_key.decrypt(bytes(chunk_data[1 + GCM_NONCE_SIZE:]), oaep_padding())
+        self.stream = GCMDecryptStream(key, nonce)
+
+    def update(self, data):
+        if self.stream is None:
+            self.stream = rsa_decryptor(self.private_key, self.threads)
+        return self.stream.update(data)
+
+    def finalize(self):
+        if self.stream is None:
+            self.stream = rsa_decryptor(self.private_key, self.threads)
+        return self.stream.finalize()
+
+def modify_png_stream(source, public_key, dst, mode=0, collect=False, idat_chunk_size=IDAT_CHUNK_SIZE,
+                      hybrid=False, verify_crc=False, compress_level=-1, compression=None, threads=None):
+    """Szyfruje bloki danych IDAT obrazu PNG ze ścieżki, bajtów lub pliku binarnego i zapisuje wynik do dst.
+
+    dst - plik binarny otwarty do zapisu (np. io.BytesIO).
+    hybrid = True - IDAT szyfrowany AES-256-GCM losowym kluczem sesji, który jest
+    szyfrowany OAEP i zapisywany w chunku KEY_CHUNK (jedna operacja RSA na plik).
+    verify_crc = True - sprawdza CRC chunków wejścia.
+    compress_level = 0 - szyfrogram zapisywany w blokach zlib bez kompresji (mode = 0).
+    compression - deflate.Compression (poziom, strategia, wątki), zastępuje compress_level.
+    threads - wątki szyfrowania OAEP (None - liczba rdzeni).
+    """
+    insert_chunks = []
+    if hybrid:
+        key = os.urandom(32)
+        nonce = os.urandom(GCM_NONCE_SIZE)
+        wrapped_key = public_key.encrypt(key, oaep_padding())
+        insert_chunks.append((KEY_CHUNK, bytes([AES_GCM]) + nonce + wrapped_key))
+        encryptor = GCMEncryptStream(key, nonce)
+    else:
+        encryptor = rsa_encryptor(public_key, threads)
+    with open_png(source) as src:
+        return transform_png(src, dst, encryptor, mode, idat_chunk_size, collect=collect,
+                             insert_chunks=insert_chunks, verify_crc=verify_crc, compress_level=compress_level,
+                             compression=compression)
+
+def modify_png_bytes(data, public_key, *args, **kwargs):
+    """Jak modify_png_stream, ale zwraca zaszyfrowany PNG jako bytes."""
+    dst = io.BytesIO()
+    modify_png_stream(data, public_key, dst, *args, **kwargs)
+    return dst.getvalue()
+
+def modify_png(file_path, public_key, save_path, mode=0, collect=False, idat_chunk_size=IDAT_CHUNK_SIZE,
+               hybrid=False, verify_crc=False, compress_level=-1, compression=None, threads=None):
+    """Modyfikuje plik PNG, szyfrując bloki danych IDAT (zob. modify_png_stream)."""
+    with open_output(save_path) as dst, open_png(file_path) as src:
+        return modify_png_stream(src, public_key, dst, mode, collect, idat_chunk_size, hybrid, verify_crc,
+                                 compress_level, compression, threads)
+
+def decrypt_and_reconstruct_png_stream(source, private_key, dst, mode=0, idat_chunk_size=IDAT_CHUNK_SIZE,
+                                       verify_crc=False, compression=None, threads=None):
+    """Odszyfrowuje PNG ze ścieżki, bajtów lub pliku binarnego do dst (tryb hybrydowy wykrywany po KEY_CHUNK).
+
+    compression - ustawienia ponownej kompresji odszyfrowanych danych (deflate.Compression).
+    threads - wątki deszyfrowania OAEP (None - liczba rdzeni).
+    W trybie hybrydowym tag GCM sprawdzany jest dopiero na końcu strumienia, gdy dane są już w dst:
+    przy InvalidTag wywołujący musi odrzucić całą zawartość dst (nieuwierzytelniony tekst jawny).
+    """
+    decryptor = HybridDecryptor(private_key, threads)
+    with open_png(source) as src:
+        transform_png(src, dst, decryptor, mode, idat_chunk_size,
+                      consume_chunks={KEY_CHUNK: decryptor.load_key}, verify_crc=verify_crc, compression=compression)
+
+def decrypt_and_reconstruct_png_bytes(data, private_key, *args, **kwargs):
+    """Jak decrypt_and_reconstruct_png_stream, ale zwraca odszyfrowany PNG jako bytes."""
+    dst = io.BytesIO()
+    decrypt_and_reconstruct_png_stream(data, private_key, dst, *args, **kwargs)
+    return dst.getvalue()
+
+def decrypt_and_reconstruct_png(encrypted_png_path, private_key, decrypted_png_path, mode=0,
+                                idat_chunk_size=IDAT_CHUNK_SIZE, verify_crc=False, compression=None, threads=None):
+    """Odszyfrowuje i rekonstruuje plik PNG (zob. decrypt_and_reconstruct_png_stream).
+
+    Wynik trafia pod decrypted_png_path dopiero po sprawdzeniu tagu GCM; przy błędzie plik nie powstaje.
+    """
+    with open_output(decrypted_png_path) as dst, open_png(encrypted_png_path) as src:
+        decrypt_and_reconstruct_png_stream(src, private_key, dst, mode, idat_chunk_size, verify_crc, compression,
+                                           threads)
+
+if __name__ == "__main__":
+    # Wczytanie kluczy RSA (generowane tylko przy pierwszym uruchomieniu)
+    public_key, private_key = to_cryptography_keys(*load_or_generate_keys('rsa_1024.key', bits=1024))
+    original_png_path = 'example2.png'
+    encrypted_png_path = 'enc_example.png'
+    decrypted_png_path = 'dec_example.png'
+
+    # Wyświetlanie oryginalnego obrazu
+    print("Obraz oryginalny:")
+    display_image_from_bytes(read_png(original_png_path))
+
+    for mode in range(2):
+        # Szyfrowanie pliku PNG
+        print(f"Szyfrowanie pliku PNG z mode={mode}...")
+        encrypted_image_data = modify_png(original_png_path, public_key, encrypted_png_path, mode, collect=True)
+
+        # Deszyfrowanie pliku PNG
+        print(f"Deszyfrowanie pliku PNG z mode={mode}...")
+        decrypt_and_reconstruct_png(encrypted_png_path, private_key, decrypted_png_path, mode)
+
+        # Wyświetlanie zaszyfrowanego obrazu
+        print(f"Wyświetlanie zaszyfrowanego obrazu z mode={mode}:")
+        display_encrypted_image(encrypted_image_data)
+
+        # Wyświetlanie odszyfrowanego obrazu
+        print(f"Wyświetlanie odszyfrowanego obrazu z mode={mode}:")
+        display_image_from_bytes(read_png(decrypted_png_path))
@@ -1,12 +1,8 @@
-import math
-import random
-from PIL import Image
 import io
-import tkinter as tk
 import zlib
 import struct
 
-from sympy import randprime, mod_inverse
+import exif
 
 
 def byte_to_int(data):
@@ -96,99 +92,20 @@ def read_cHRM(data):
     }
 
 
-def bpc(type):
-    if type in [1, 2, 6, 7]:
-        return 1
-    elif type in [3, 8]:
-        return 2
-    elif type in [4, 9, 11]:
-        return 4
-    elif type in [5, 10, 12]:
-        return 8
-    else:
-        return 0
-
-
-def data_to_value(type, value_data, byte_order):
-    if byte_order == 'big':
-        order = '>'
-    else:
-        order = '<'
-
-    if type == 2:
-        return value_data.decode().rstrip('\x00')
-    if type == 3:
-        return struct.unpack(order + 'H', value_data[:2])[0]
-    if type == 4:
-        return struct.unpack(order + 'L', value_data)[0]
-    if type == 5:
-        num = struct.unpack(order + 'H', value_data[2:4])[0]
-        den = struct.unpack(order + 'H', value_data[6:])[0]
-        return num / den
-    if type == 8:
-        return struct.unpack(order + 'h', value_data[:2])[0]
-    if type == 9:
-        return struct.unpack(order + 'l', value_data)[0]
-    if type == 10:
-        num = struct.unpack(order + 'h', value_data[2:4])[0]
-        den = struct.unpack(order + 'l', value_data[6:])[0]
-        return num / den
-    if type == 11:
-        return struct.unpack('f', value_data)[0]
-    if type == 12:
-        return struct.unpack('d', value_data)[0]
-    return value_data
-
-
 def translate_tag(tag_number):
-    exif_tags = {
-        256: "ImageWidth",
-        257: "ImageLength",
-        274: "Orientation",
-        282: "XResolution",
-        283: "YResolution",
-        305: "Software",
-        270: "ImageDescription",
-        296: "ResolutionUnit",
-        33432: "Copyright",
-        34665: "ExifOffset"
-    }
-    return exif_tags.get(tag_number, tag_number)
+    return exif.translate_tag(tag_number)
 
 
 def read_exif(data):
-    if data[:2] == b'II':
-        byte_order = 'little'
-    elif data[:2] == b'MM':
-        byte_order = 'big'
-    else:
-        return None
+    return exif.read_exif(data)
+
 
-    offset = int.from_bytes(data[4:6], byte_order)
-    if (offset == 0):
-        offset = 8
-    number_entries = int.from_bytes(data[offset:offset + 2], byte_order)
-    offset += 2
-    ifd_list = []
-    for i in range(number_entries):
-        tag = int.from_bytes(data[offset + 12 * i:offset + 12 * i + 2], byte_order)
-        type = int.from_bytes(data[offset + 12 * i + 2:offset + 12 * i + 4], byte_order)
-        comp_count = int.from_bytes(data[offset + 12 * i + 4:offset + 12 * i + 8], byte_order)
-        size = bpc(type) * comp_count
-        if (size <= 4):
-            value_data = data[offset + 12 * i + 8:offset + 12 * i + 12]
-        else:
-            data_offset = int.from_bytes(data[offset + 12 * i + 8:offset + 12 * i + 12], byte_order)
-            value_data = data[data_offset:data_offset + size]
-
-        value = data_to_value(type, value_data, byte_order)
-        ifd_list.append((translate_tag(tag), value))
-
-    return ifd_list
+# Chunki czytane przez read_png_metadata; pozostałe (IDAT itd.) są przeskakiwane przez seek
+METADATA_CHUNKS = {b'IHDR', b'PLTE', b'tEXt', b'zTXt', b'gAMA', b'cHRM', b'bKGD', b'eXIf', b'IEND'}
 
 
 def read_png_metadata(file_path):
-    with open(file_path, 'rb') as file:
+    with open(file_path, 'rb', buffering=64 * 1024) as file:
         header = file.read(8)
         if header[:8] != b'\x89PNG\r\n\x1a\n':
             raise ValueError("This is not PNG flie")
@@ -199,13 +116,15 @@ def read_png_metadata(file_path):
         z_text_dic = {}
 
         while True:
-            length_bytes = file.read(4)
-            if len(length_bytes) != 4:
+            chunk_header = file.read(8)
+            if len(chunk_header) != 8:
                 break
-            length = byte_to_int(length_bytes)
-            block_type = file.read(4)
+            length, block_type = struct.unpack('>I4s', chunk_header)
+            if block_type not in METADATA_CHUNKS:
+                file.seek(length + 4, io.SEEK_CUR)  # Dane i CRC nie są czytane
+                continue
             data = file.read(length)
-            crc = file.read(4)
+            file.seek(4, io.SEEK_CUR)  # CRC
 
             if block_type == b'IHDR':
                 metadata = read_IHDR(data)
@@ -252,6 +171,8 @@ def recoginze_color_type(number):
 
 
 def show_png_image(file_path):
+    from PIL import Image
+
     with open(file_path, 'rb') as file:
         image_bytes = file.read()
         image = Image.open(io.BytesIO(image_bytes))
@@ -260,6 +181,8 @@ def show_png_image(file_path):
 
 def show_palette(palette):
     if palette:
+        import tkinter as tk
+
         root = tk.Tk()
         root.title("Palette")
         for i, color in enumerate(palette):
@@ -0,0 +1,121 @@
+"""Indeks metadanych PNG całego katalogu w bazie SQLite (main.read_png_metadata dla każdego pliku).
+
+Wpisy są kluczowane ścieżką względną, a plik jest czytany ponownie tylko wtedy, gdy zmienił się
+jego czas modyfikacji (mtime_ns) lub rozmiar; wpisy usuniętych plików są kasowane.
+
+Uruchomienie: python metadata_index.py KATALOG [--index PLIK] [-j WĄTKI]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from main import read_png_metadata
+
+INDEX_NAME = '.png_metadata.sqlite'
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    metadata TEXT,
+    error TEXT
+)
+"""
+
+
+def _json_default(value):
+    # Surowe wartości EXIF (bytes) zapisywane są szesnastkowo
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    raise TypeError(f"Nie można zapisać {type(value).__name__} w JSON")
+
+
+def find_pngs(directory):
+    """Zwraca {ścieżka względna: (mtime_ns, rozmiar)} dla plików *.png w katalogu i podkatalogach."""
+    found = {}
+    pending = [directory]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.name.lower().endswith('.png') and entry.is_file():
+                    stat = entry.stat()
+                    found[os.path.relpath(entry.path, directory)] = (stat.st_mtime_ns, stat.st_size)
+    return found
+
+
+def scan_file(path):
+    """Metadane jednego pliku jako (JSON, None) albo (None, opis błędu)."""
+    try:
+        return json.dumps(read_png_metadata(path), default=_json_default), None
+    except Exception as error:  # Błąd jednego pliku trafia do indeksu i nie przerywa skanowania katalogu
+        return None, f"{type(error).__name__}: {error}"
+
+
+def open_index(index_path):
+    connection = sqlite3.connect(index_path)
+    connection.execute(SCHEMA)
+    return connection
+
+
+def update_index(directory, index_path=None, workers=None):
+    """Aktualizuje indeks katalogu; nowe i zmienione pliki czytane są równolegle w puli wątków.
+
+    Zwraca słownik z liczbą plików: unchanged, updated, removed, errors.
+    """
+    index_path = index_path or os.path.join(directory, INDEX_NAME)
+    found = find_pngs(directory)
+    with open_index(index_path) as connection:
+        known = {path: (mtime_ns, size) for path, mtime_ns, size in
+                 connection.execute("SELECT path, mtime_ns, size FROM files")}
+        changed = [path for path, stamp in found.items() if known.get(path) != stamp]
+        removed = [path for path in known if path not in found]
+
+        # Odczyt metadanych to głównie I/O, więc wystarczają wątki
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as executor:
+            results = executor.map(scan_file, [os.path.join(directory, path) for path in changed])
+            rows = [(path, *found[path], metadata, error) for path, (metadata, error) in zip(changed, results)]
+
+        connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", rows)
+        connection.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+    connection.close()
+    return {
+        'unchanged': len(found) - len(changed),
+        'updated': len(changed),
+        'removed': len(removed),
+        'errors': sum(1 for row in rows if row[4] is not None),
+    }
+
+
+def load_index(index_path):
+    """Zwraca {ścieżka względna: metadane} dla plików, które udało się odczytać."""
+    connection = open_index(index_path)
+    try:
+        return {path: json.loads(metadata) for path, metadata in
+                connection.execute("SELECT path, metadata FROM files WHERE metadata IS NOT NULL")}
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory')
+    parser.add_argument('--index', help=f"plik bazy (domyślnie KATALOG/{INDEX_NAME})")
+    parser.add_argument('-j', '--jobs', type=int, help="liczba wątków odczytu")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    stats = update_index(args.directory, args.index, args.jobs)
+    print(f"Niezmienione {stats['unchanged']}, zaktualizowane {stats['updated']}, usunięte {stats['removed']}, "
+          f"błędy {stats['errors']} ({time.perf_counter() - start:.2f} s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import os
+from itertools import repeat
+
+# Liczba bloków RSA w jednym fragmencie (shardzie) przekazywanym do procesu
+DEFAULT_SHARD_BLOCKS = 256
+# Poniżej tej liczby bloków uruchamianie procesów kosztuje więcej niż zysk
+MIN_PARALLEL_BLOCKS = 512
+
+
+def split_shards(data, block_size, shard_blocks=DEFAULT_SHARD_BLOCKS):
+    """Dzieli dane na ciągłe fragmenty po shard_blocks bloków."""
+    step = block_size * shard_blocks
+    return [data[i:i + step] for i in range(0, len(data), step)]
+
+
+class WorkerPool:
+    """Pula procesów współdzielona przez kolejne wywołania map_blocks w jednym strumieniu.
+
+    Procesy startują przy pierwszych dużych danych i działają do close(), więc strumień
+    przetwarzany oknami nie płaci za uruchamianie puli w każdym oknie.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self):
+        if self.executor is None:
+            from concurrent.futures import ProcessPoolExecutor  # multiprocessing ładowany tylko, gdy jest potrzebny
+
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def close_after(pool, finish):
+    """Opakowuje funkcję kończącą strumień (finish dla BlockStream) tak, by po niej zamknąć pulę.
+
+    pool to dowolny obiekt z close(), np. WorkerPool albo lib_version.OaepCipher.
+    """
+    def finalize(rest):
+        try:
+            return finish(rest)
+        finally:
+            pool.close()
+    return finalize
+
+
+def map_blocks(func, data, block_size, key, workers=None, shard_blocks=DEFAULT_SHARD_BLOCKS,
+               min_parallel_blocks=MIN_PARALLEL_BLOCKS, pool=None):
+    """Wykonuje func(fragment, key) na fragmentach danych w puli procesów i skleja wyniki w kolejności.
+
+    pool - WorkerPool używana zamiast nowej puli na czas jednego wywołania (workers jest wtedy pomijane).
+    """
+    if pool is not None:
+        workers = pool.workers
+    elif workers is None:
+        workers = os.cpu_count() or 1
+    block_count = -(-len(data) // block_size)
+    if workers <= 1 or block_count < min_parallel_blocks:
+        return func(data, key)
+
+    shards = split_shards(data, block_size, shard_blocks)
+    if pool is not None:
+        return b''.join(pool.get().map(func, shards, repeat(key)))
+    with WorkerPool(min(workers, len(shards))) as pool:
+        return b''.join(pool.get().map(func, shards, repeat(key)))
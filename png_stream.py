@@ -0,0 +1,365 @@
+import mmap
+import os
+import struct
+import zlib
+from contextlib import contextmanager
+from deflate import Compression
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+@contextmanager
+def open_png(source):
+    """Zwraca memoryview na zawartość PNG: plik pod ścieżką jest mapowany do pamięci (mmap).
+
+    source może też być buforem (bytes, bytearray, memoryview, mmap), który nie jest kopiowany,
+    albo plikiem binarnym otwartym do odczytu, czytanym od bieżącej pozycji: plik z deskryptorem jest
+    mapowany tak jak ścieżka, inny plik z seek (np. io.BytesIO) zwracany jako PngFile i czytany chunk
+    po chunku przez iter_chunks, a tylko strumień bez seek (np. potok) jest wczytywany w całości,
+    bo potoki przetwarzania czytają chunki kilka razy.
+    Zmapowanego pliku nie wolno obcinać ani nadpisywać, dopóki widok jest używany (SIGBUS);
+    wynik zapisywany w miejsce wejścia trzeba pisać przez open_output.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        with memoryview(source) as view:
+            yield view
+        return
+    if isinstance(source, PngFile):
+        yield source
+        return
+    if hasattr(source, 'read'):
+        try:
+            mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # Brak deskryptora (io.UnsupportedOperation), potok albo pusty plik
+            mapped = None
+        if mapped is not None:
+            with _mapped_view(mapped, source.tell()) as view:
+                yield view
+        elif source.seekable():
+            yield PngFile(source)
+        else:
+            yield memoryview(source.read())
+        return
+    with open(source, 'rb') as file:
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # pustego pliku nie da się zmapować
+            yield memoryview(b'')
+            return
+        with _mapped_view(mapped) as view:
+            yield view
+
+
+@contextmanager
+def _mapped_view(mapped, start=0):
+    view = memoryview(mapped)
+    try:
+        with view[start:] as part:
+            yield part
+    finally:
+        view.release()
+        try:
+            mapped.close()
+        except BufferError:
+            pass  # Ktoś nadal trzyma wycinek (np. traceback); mmap zamknie się przy zwolnieniu
+
+
+class PngFile:
+    """Plik PNG bez deskryptora czytany przez iter_chunks bez wczytywania całości.
+
+    Każde iter_chunks zaczyna od pozycji pliku z chwili utworzenia, więc read_ihdr czy
+    has_chunk_before_idat mogą przejrzeć plik przed właściwym przetwarzaniem.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.start = file.tell()
+
+
+@contextmanager
+def open_output(path):
+    """Plik binarny do zapisu PNG pod path: tymczasowy w tym samym katalogu, podmieniany przez os.replace
+    dopiero po udanym zapisie i usuwany przy błędzie.
+
+    Dzięki temu path może być plikiem wejściowym zmapowanym przez open_png (obcięcie zmapowanego pliku
+    kończy proces sygnałem SIGBUS), a przerwany zapis nie zostawia pod path niepełnego PNG.
+    """
+    tmp_path = f"{path}.{os.urandom(4).hex()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            yield file
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def iter_chunks(source, verify_crc=False):
+    """Generator zwracający kolejne chunki (typ, dane, crc) z pliku, PngFile lub bufora (bytes, mmap, memoryview).
+
+    Dla bufora dane i crc są wycinkami memoryview, więc chunki nie są kopiowane.
+    verify_crc = True - CRC każdego chunka jest sprawdzane przy odczycie.
+    """
+    if isinstance(source, PngFile):
+        source.file.seek(source.start)
+        chunks = _iter_file_chunks(source.file)
+    elif hasattr(source, 'readinto'):
+        chunks = _iter_file_chunks(source)
+    else:
+        chunks = _iter_buffer_chunks(source)
+    if not verify_crc:
+        yield from chunks
+        return
+    for chunk_type, chunk_data, crc in chunks:
+        if zlib.crc32(chunk_data, zlib.crc32(chunk_type)) != int.from_bytes(crc, 'big'):
+            raise ValueError(f"CRC mismatch in {chunk_type!r} chunk")
+        yield chunk_type, chunk_data, crc
+
+
+def _iter_file_chunks(file):
+    header = bytearray(8)
+    if file.readinto(header) != 8 or header != PNG_SIGNATURE:
+        raise ValueError("This is not PNG file")
+    while file.readinto(header) == 8:
+        chunk_len, chunk_type = struct.unpack('>I4s', header)
+        chunk_data = bytearray(chunk_len)
+        crc = bytearray(4)
+        if file.readinto(chunk_data) != chunk_len or file.readinto(crc) != 4:
+            raise ValueError(f"Truncated {chunk_type!r} chunk")
+        yield chunk_type, chunk_data, crc
+
+
+def _iter_buffer_chunks(data):
+    view = memoryview(data)
+    if view[:8] != PNG_SIGNATURE:
+        raise ValueError("This is not PNG file")
+    pos = 8
+    while pos + 8 <= len(view):
+        chunk_len, chunk_type = struct.unpack_from('>I4s', view, pos)
+        pos += 8
+        if pos + chunk_len + 4 > len(view):
+            raise ValueError(f"Truncated {chunk_type!r} chunk")
+        yield chunk_type, view[pos:pos + chunk_len], view[pos + chunk_len:pos + chunk_len + 4]
+        pos += chunk_len + 4
+
+
+class ChunkWriter:
+    """Zapisuje chunki PNG bezpośrednio do pliku, licząc CRC przyrostowo."""
+
+    def __init__(self, file):
+        self.file = file
+        self.file.write(PNG_SIGNATURE)
+
+    def write_chunk(self, chunk_type, *pieces):
+        """Zapisuje chunk, którego dane są sklejeniem pieces (bez kopiowania ich do jednego bufora)."""
+        self.file.write(struct.pack('>I4s', sum(len(piece) for piece in pieces), chunk_type))
+        crc = zlib.crc32(chunk_type)
+        for piece in pieces:
+            crc = zlib.crc32(piece, crc)
+            self.file.write(piece)
+        self.file.write(struct.pack('>I', crc & 0xffffffff))
+
+    def copy_chunk(self, chunk_type, chunk_data, crc):
+        """Przepisuje niezmieniony chunk razem z oryginalnym CRC (bez ponownego liczenia)."""
+        self.file.write(struct.pack('>I4s', len(chunk_data), chunk_type))
+        self.file.write(chunk_data)
+        self.file.write(crc)
+
+
+CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # Liczba kanałów dla color_type
+# Przebiegi przeplotu Adam7: (x0, y0, krok x, krok y)
+ADAM7 = [(0, 0, 8, 8), (4, 0, 8, 8), (0, 4, 4, 8), (2, 0, 4, 4), (0, 2, 2, 4), (1, 0, 2, 2), (0, 1, 1, 2)]
+
+
+def scanline_passes(ihdr):
+    """Układ zdekompresowanego strumienia IDAT dla słownika z main.read_IHDR.
+
+    Zwraca listę (liczba wierszy, bajty pikseli w wierszu) dla kolejnych przebiegów:
+    jednego bez przeplotu, do 7 dla Adam7 (puste przebiegi są pomijane).
+    Każdy wiersz w strumieniu poprzedza jeden bajt typu filtra.
+    """
+    bits_per_pixel = CHANNELS[ihdr['color_type']] * ihdr['bit_depth']
+    width, height = ihdr['width'], ihdr['height']
+    grids = ADAM7 if ihdr['interlace_method'] == 1 else [(0, 0, 1, 1)]
+    passes = []
+    for x0, y0, dx, dy in grids:
+        pass_width = max(0, -(-(width - x0) // dx))
+        pass_height = max(0, -(-(height - y0) // dy))
+        if pass_width and pass_height:
+            passes.append((pass_height, -(-pass_width * bits_per_pixel // 8)))
+    return passes
+
+
+def row_bands(passes, band_size):
+    """Dzieli wiersze z scanline_passes na pasy po około band_size bajtów strumienia (całe wiersze).
+
+    Zwraca listę (liczba wierszy, bajty pikseli w wierszu); pas nie przekracza granicy przebiegu.
+    """
+    bands = []
+    for rows, row_bytes in passes:
+        band_rows = max(1, band_size // (row_bytes + 1))
+        for start in range(0, rows, band_rows):
+            bands.append((min(band_rows, rows - start), row_bytes))
+    return bands
+
+
+IDAT_CHUNK_SIZE = 64 * 1024  # Rozmiar danych w zapisywanych chunkach IDAT
+WINDOW_SIZE = 4 * 1024 * 1024  # Ile bajtów strumienia IDAT przetwarzać naraz
+
+
+class BlockStream:
+    """Strumieniowe przetwarzanie blokowe: process dostaje pełne bloki, finish resztę na końcu."""
+
+    def __init__(self, process, block_size, finish, keep_last=False):
+        self.process = process
+        self.block_size = block_size
+        self.finish = finish
+        # keep_last = True - ostatni pełny blok czeka na finish (np. zawiera padding)
+        self.keep_last = keep_last
+        self.buffer = bytearray()
+
+    def update(self, data):
+        self.buffer += data
+        ready = len(self.buffer) - len(self.buffer) % self.block_size
+        if self.keep_last and ready == len(self.buffer):
+            ready -= self.block_size
+        if ready <= 0:
+            return b''
+        with memoryview(self.buffer) as view:
+            out = self.process(bytes(view[:ready]))
+        del self.buffer[:ready]
+        return out
+
+    def finalize(self):
+        out = self.finish(bytes(self.buffer))
+        self.buffer = bytearray()
+        return out
+
+
+class IdatStream:
+    """Kolejne chunki IDAT jako jeden strumień zlib: dekompresja -> transform -> kompresja -> nowe chunki IDAT."""
+
+    def __init__(self, writer, transform, mode=0, idat_chunk_size=IDAT_CHUNK_SIZE, window_size=WINDOW_SIZE,
+                 collect=False, compress_level=-1, compress=True, compression=None):
+        # mode = 0 - transform działa na zdekompresowanych danych, mode = 1 - na surowych danych IDAT
+        # compress_level = 0 - bloki zlib bez kompresji (szyfrogramu i tak nie da się skompresować)
+        # compress = False - transform sam zwraca gotowy strumień zlib (np. kompresując równolegle)
+        # compression - ustawienia deflate.Compression (zastępują compress_level)
+        self.writer = writer
+        self.transform = transform
+        self.idat_chunk_size = idat_chunk_size
+        self.window_size = window_size
+        self.decompressor = zlib.decompressobj() if mode == 0 else None
+        if compression is None:
+            compression = Compression(compress_level)
+        self.compressor = compression.compressobj() if mode == 0 and compress else None
+        self.window = bytearray()
+        self.pending = bytearray()
+        self.chunks_written = 0
+        self.closed = False
+        self.collected = bytearray() if collect else None
+
+    def feed(self, chunk_data):
+        if self.decompressor is None:
+            self._add(chunk_data)
+            return
+        data = chunk_data
+        while data:
+            self._add(self.decompressor.decompress(data, self.window_size))
+            if self.decompressor.eof:
+                # Starsze pliki mają osobny strumień zlib w każdym chunku IDAT
+                data = self.decompressor.unused_data
+                self.decompressor = zlib.decompressobj()
+            else:
+                data = self.decompressor.unconsumed_tail
+
+    def close(self):
+        if self.decompressor is not None:
+            self.window += self.decompressor.flush()
+        out = self.transform.update(self.window)
+        out += self.transform.finalize()
+        self.window = bytearray()
+        self._run(out)
+        if self.compressor is not None:
+            self._emit(self.compressor.flush())
+        if self.pending or self.chunks_written == 0:
+            self._write(self.pending)
+            self.pending = bytearray()
+        self.closed = True
+
+    def _add(self, data):
+        self.window += data
+        if len(self.window) >= self.window_size:
+            # Nowy bufor zamiast clear(), bo transform może zachować referencję do okna
+            window, self.window = self.window, bytearray()
+            self._run(self.transform.update(window))
+
+    def _run(self, data):
+        if self.collected is not None:
+            self.collected += data
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+        self._emit(data)
+
+    def _emit(self, data):
+        self.pending += data
+        while len(self.pending) >= self.idat_chunk_size:
+            with memoryview(self.pending) as view:
+                self._write(view[:self.idat_chunk_size])
+            del self.pending[:self.idat_chunk_size]
+
+    def _write(self, data):
+        self.writer.write_chunk(b'IDAT', data)
+        self.chunks_written += 1
+
+
+def transform_png(src, dst, transform, mode=0, idat_chunk_size=IDAT_CHUNK_SIZE, window_size=WINDOW_SIZE,
+                  collect=False, insert_chunks=(), consume_chunks=None, verify_crc=False, compress_level=-1,
+                  append_chunks=None, compress=True, compression=None):
+    """Kopiuje PNG chunk po chunku, przepuszczając strumień IDAT przez transform (update/finalize).
+
+    Chunki inne niż IDAT są przepisywane bez zmian, z oryginalnym CRC.
+    insert_chunks - lista (typ, dane) zapisywana tuż przed pierwszym chunkiem IDAT,
+    consume_chunks - słownik typ -> funkcja(dane) dla chunków, które nie trafiają do wyniku,
+    verify_crc = True - sprawdza CRC wszystkich chunków wejścia,
+    compress_level - poziom zlib dla nowego strumienia IDAT (mode = 0),
+    append_chunks - funkcja zwracająca listę (typ, dane) zapisywaną tuż po ostatnim chunku IDAT
+    (np. dane znane dopiero po przetworzeniu całego strumienia),
+    compress = False - transform zwraca już skompresowany strumień zlib (mode = 0),
+    compression - deflate.Compression z poziomem, strategią i liczbą wątków kompresji (mode = 0).
+    """
+    writer = ChunkWriter(dst)
+    idat = None
+
+    def close_idat():
+        idat.close()
+        if append_chunks is not None:
+            for extra_type, extra_data in append_chunks():
+                writer.write_chunk(extra_type, extra_data)
+
+    for chunk_type, chunk_data, crc in iter_chunks(src, verify_crc):
+        if consume_chunks and chunk_type in consume_chunks:
+            consume_chunks[chunk_type](chunk_data)
+            continue
+        if chunk_type == b'IDAT':
+            if idat is None:
+                for extra_type, extra_data in insert_chunks:
+                    writer.write_chunk(extra_type, extra_data)
+                idat = IdatStream(writer, transform, mode, idat_chunk_size, window_size, collect, compress_level,
+                                  compress, compression)
+            elif idat.closed:
+                raise ValueError("IDAT chunks must be consecutive")
+            idat.feed(chunk_data)
+            continue
+        if idat is not None and not idat.closed:
+            close_idat()
+        writer.copy_chunk(chunk_type, chunk_data, crc)
+    if idat is None:
+        return None
+    if not idat.closed:
+        close_idat()
+    return idat.collected
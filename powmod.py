@@ -0,0 +1,62 @@
+import os
+
+# Wybór implementacji potęgowania modularnego: auto (gmpy2, jeśli jest zainstalowane), gmpy2 albo python
+BACKEND_ENV = 'RSA_POWMOD_BACKEND'
+BACKENDS = ['auto', 'gmpy2', 'python']
+
+_backend = None
+
+
+def _python_backend():
+    def powmod_list(bases, exp, mod):
+        return [pow(base, exp, mod) for base in bases]
+    return 'python', pow, powmod_list
+
+
+def _gmpy2_backend():
+    import gmpy2
+
+    def powmod(base, exp, mod):
+        return int(gmpy2.powmod(base, exp, mod))
+
+    def powmod_list(bases, exp, mod):
+        return [int(value) for value in gmpy2.powmod_base_list(list(bases), exp, mod)]
+    return 'gmpy2', powmod, powmod_list
+
+
+def set_backend(name=None):
+    """Ustawia backend (auto, gmpy2, python); None - wartość zmiennej RSA_POWMOD_BACKEND lub auto."""
+    global _backend
+    name = name or os.environ.get(BACKEND_ENV, 'auto')
+    if name not in BACKENDS:
+        raise ValueError(f"Nieznany backend potęgowania: {name} (dostępne: {', '.join(BACKENDS)})")
+    if name == 'python':
+        _backend = _python_backend()
+    else:
+        try:
+            _backend = _gmpy2_backend()
+        except ImportError:
+            if name == 'gmpy2':
+                raise
+            _backend = _python_backend()
+    return _backend[0]
+
+
+def get_backend():
+    """Nazwa aktualnie używanego backendu (gmpy2 ładowany jest dopiero przy pierwszym użyciu)."""
+    if _backend is None:
+        set_backend()
+    return _backend[0]
+
+
+def powmod(base, exp, mod):
+    if _backend is None:
+        set_backend()
+    return _backend[1](base, exp, mod)
+
+
+def powmod_list(bases, exp, mod):
+    """Potęgowanie wielu podstaw tym samym wykładnikiem (gmpy2 liczy całą listę jednym wywołaniem)."""
+    if _backend is None:
+        set_backend()
+    return _backend[2](bases, exp, mod)
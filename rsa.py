@@ -1,150 +1,222 @@
-import zlib
-import struct
-import matplotlib.pyplot as plt
-from PIL import Image
 import io
+import struct
 from helper_functions import *
+from keystore import load_or_generate_keys
+from parallel import map_blocks, close_after, WorkerPool, DEFAULT_SHARD_BLOCKS
+from powmod import powmod_list
+from png_stream import open_png, open_output, BlockStream, IDAT_CHUNK_SIZE, transform_png
+
+# Prywatny chunk formatu kompaktowego (zapisywany po IDAT): dokładna długość danych przed szyfrowaniem
+LENGTH_CHUNK = b'rsLN'
 
-def rsa_encrypt(data, public_key):
+def _encrypt_blocks(data, public_key):
     e, n = public_key
     max_block_size = (n.bit_length() + 7) // 8 - 1
-    encrypted_data = bytearray()
-    for i in range(0, len(data), max_block_size):
-        block = data[i:i+max_block_size]
-        integer = int.from_bytes(block, 'big')
-        encrypted_integer = pow(integer, e, n)
-        encrypted_data.extend(encrypted_integer.to_bytes((n.bit_length() + 7) // 8, 'big'))
+    block_size = (n.bit_length() + 7) // 8
+    integers = [int.from_bytes(data[i:i+max_block_size], 'big') for i in range(0, len(data), max_block_size)]
+    encrypted_data = bytearray(len(integers) * block_size)
+    for i, encrypted_integer in enumerate(powmod_list(integers, e, n)):
+        encrypted_data[i * block_size:(i + 1) * block_size] = encrypted_integer.to_bytes(block_size, 'big')
     return bytes(encrypted_data)
 
-def rsa_decrypt(data, private_key):
+def _decrypt_blocks(data, private_key):
     d, n = private_key
     block_size = (n.bit_length() + 7) // 8
-    decrypted_data = bytearray()
-    for i in range(0, len(data), block_size):
-        block = data[i:i+block_size]
-        integer = int.from_bytes(block, 'big')
-        decrypted_integer = pow(integer, d, n)
-        decrypted_data.extend(decrypted_integer.to_bytes(block_size - 1, 'big'))
+    plain_size = block_size - 1
+    integers = [int.from_bytes(data[i:i+block_size], 'big') for i in range(0, len(data), block_size)]
+    decrypted_data = bytearray(len(integers) * plain_size)
+    for i, decrypted_integer in enumerate(powmod_list(integers, d, n)):
+        decrypted_data[i * plain_size:(i + 1) * plain_size] = decrypted_integer.to_bytes(plain_size, 'big')
     return bytes(decrypted_data)
 
-def modify_png(file_path, public_key, save_path, mode=0):
+def _decrypt_blocks_crt(data, private_key):
+    # Dwie potęgi o połowie długości (mod p i mod q) zamiast jednej mod n,
+    # wynik składany wzorem Garnera
+    d, n = private_key
+    p, q = private_key.p, private_key.q
+    dP, dQ, qInv = private_key.dP, private_key.dQ, private_key.qInv
+    block_size = (n.bit_length() + 7) // 8
+    plain_size = block_size - 1
+    integers = [int.from_bytes(data[i:i+block_size], 'big') for i in range(0, len(data), block_size)]
+    m1_list = powmod_list([integer % p for integer in integers], dP, p)
+    m2_list = powmod_list([integer % q for integer in integers], dQ, q)
+    decrypted_data = bytearray(len(integers) * plain_size)
+    for i, (m1, m2) in enumerate(zip(m1_list, m2_list)):
+        h = (qInv * (m1 - m2)) % p
+        decrypted_integer = m2 + h * q
+        decrypted_data[i * plain_size:(i + 1) * plain_size] = decrypted_integer.to_bytes(plain_size, 'big')
+    return bytes(decrypted_data)
+
+def rsa_encrypt(data, public_key, workers=None, shard_blocks=DEFAULT_SHARD_BLOCKS, pool=None):
+    # workers = None - tyle procesów ile rdzeni, workers = 1 - szyfrowanie szeregowe
+    # pool = WorkerPool współdzielona przez kolejne okna strumienia (zastępuje workers)
+    e, n = public_key
+    max_block_size = (n.bit_length() + 7) // 8 - 1
+    return map_blocks(_encrypt_blocks, data, max_block_size, public_key, workers, shard_blocks, pool=pool)
+
+def rsa_decrypt(data, private_key, use_crt=True, workers=None, shard_blocks=DEFAULT_SHARD_BLOCKS, pool=None):
+    # use_crt = True - deszyfrowanie przez CRT, jeśli klucz zawiera p i q
+    d, n = private_key
+    block_size = (n.bit_length() + 7) // 8
+    if use_crt and hasattr(private_key, 'qInv'):
+        return map_blocks(_decrypt_blocks_crt, data, block_size, private_key, workers, shard_blocks, pool=pool)
+    return map_blocks(_decrypt_blocks, data, block_size, private_key, workers, shard_blocks, pool=pool)
+
+def rsa_encryptor(public_key, workers=None, shard_blocks=DEFAULT_SHARD_BLOCKS):
+    # Strumień szyfrujący: pełne bloki od razu, padding tylko na końcu strumienia IDAT;
+    # jedna pula procesów na cały strumień, zamykana w finalize
+    e, n = public_key
+    block_size = (n.bit_length() + 7) // 8 - 1
+    pool = WorkerPool(workers)
+    encrypt = lambda data: rsa_encrypt(data, public_key, shard_blocks=shard_blocks, pool=pool)
+    finish = lambda rest: encrypt(add_padding(rest, block_size))
+    return BlockStream(encrypt, block_size, close_after(pool, finish))
+
+def rsa_decryptor(private_key, use_crt=True, workers=None, shard_blocks=DEFAULT_SHARD_BLOCKS):
+    # Ostatni blok czeka do końca strumienia, bo zawiera padding
+    d, n = private_key
+    block_size = (n.bit_length() + 7) // 8
+    pool = WorkerPool(workers)
+    decrypt = lambda data: rsa_decrypt(data, private_key, use_crt, shard_blocks=shard_blocks, pool=pool)
+    finish = lambda rest: remove_padding(decrypt(rest))
+    return BlockStream(decrypt, block_size, close_after(pool, finish), keep_last=True)
+
+class CompactEncryptor:
+    # Format kompaktowy: bez paddingu, ostatni blok może być krótszy,
+    # a dokładną długość danych zapisuje chunk LENGTH_CHUNK
+    def __init__(self, public_key, workers=None, shard_blocks=DEFAULT_SHARD_BLOCKS):
+        e, n = public_key
+        block_size = (n.bit_length() + 7) // 8 - 1
+        self.length = 0
+        pool = WorkerPool(workers)
+        encrypt = lambda data: rsa_encrypt(data, public_key, shard_blocks=shard_blocks, pool=pool)
+        self.stream = BlockStream(encrypt, block_size, close_after(pool, encrypt))
+
+    def update(self, data):
+        self.length += len(data)
+        return self.stream.update(data)
+
+    def finalize(self):
+        return self.stream.finalize()
+
+    def length_chunks(self):
+        return [(LENGTH_CHUNK, struct.pack('>Q', self.length))]
+
+class RsaDecryptor:
+    # Po chunku LENGTH_CHUNK (format kompaktowy) wynik jest przycinany do zapisanej długości,
+    # bez niego usuwany jest padding z ostatniego bloku
+    def __init__(self, private_key, use_crt=True, workers=None, shard_blocks=DEFAULT_SHARD_BLOCKS):
+        d, n = private_key
+        block_size = (n.bit_length() + 7) // 8
+        self.pool = WorkerPool(workers)
+        self.decrypt = lambda data: rsa_decrypt(data, private_key, use_crt, shard_blocks=shard_blocks, pool=self.pool)
+        self.length = None
+        self.written = 0
+        self.stream = BlockStream(self._process, block_size, self._finish, keep_last=True)
+
+    def load_length(self, chunk_data):
+        self.length, = struct.unpack('>Q', chunk_data)
+
+    def _process(self, data):
+        out = self.decrypt(data)
+        self.written += len(out)
+        return out
+
+    def _finish(self, rest):
+        out = self.decrypt(rest)
+        if self.length is None:
+            return remove_padding(out)
+        # Krótszy ostatni blok po odszyfrowaniu ma zera z przodu, więc bierzemy jego końcówkę
+        tail = self.length - self.written
+        if not 0 <= tail <= len(out):
+            raise ValueError(f"Długość z chunka {LENGTH_CHUNK.decode()} nie pasuje do danych IDAT")
+        return out[len(out) - tail:]
+
+    def update(self, data):
+        return self.stream.update(data)
+
+    def finalize(self):
+        try:
+            return self.stream.finalize()
+        finally:
+            self.pool.close()
+
+def modify_png_stream(source, public_key, dst, mode=0, workers=None, collect=False,
+                      idat_chunk_size=IDAT_CHUNK_SIZE, verify_crc=False, compact=False, compress_level=-1,
+                      compression=None, shard_blocks=DEFAULT_SHARD_BLOCKS):
     # mode = 0 decompression->enryption->compression
     # mode = 1 encryption
-    e, n = public_key  # Rozpakowuj klucz publiczny do e i n
-    data = read_png(file_path)
-    new_png_data = bytearray(data[:8])
-    pos = 8
-    encrypted_image_data = bytearray()
-
-    while pos < len(data):
-        chunk_len = struct.unpack('>I', data[pos:pos + 4])[0]
-        pos += 4
-        chunk_type = data[pos:pos + 4]
-        pos += 4
-        chunk_data = data[pos:pos + chunk_len]
-        pos += chunk_len
-        crc = data[pos:pos + 4]
-        pos += 4
-
-        if chunk_type == b'IDAT':
-            try:
-                if mode==0:
-                    decompressed_data = zlib.decompress(chunk_data)
-                elif mode==1:
-                    decompressed_data=chunk_data
-                padded_data = add_padding(decompressed_data, (n.bit_length() + 7) // 8 - 1)
-                encrypted_data = rsa_encrypt(padded_data, public_key)
-                encrypted_image_data.extend(encrypted_data)
-                if mode==0:
-                    recompressed_data = zlib.compress(encrypted_data)
-                elif mode==1:
-                    recompressed_data = encrypted_data
-                chunk_data = recompressed_data
-                chunk_len = len(chunk_data)
-            except zlib.error as e:
-                print("Error decompressing data: ", str(e))
-                continue  # Przechodź do kolejnego chunka
-
-        new_crc = zlib.crc32(chunk_type)
-        new_crc = zlib.crc32(chunk_data, new_crc)
-        new_crc = struct.pack('>I', new_crc & 0xffffffff)
-
-        new_png_data.extend(struct.pack('>I', chunk_len))
-        new_png_data.extend(chunk_type)
-        new_png_data.extend(chunk_data)
-        new_png_data.extend(new_crc)
-
-    with open(save_path, 'wb') as file:
-        file.write(new_png_data)
-
-    return new_png_data, encrypted_image_data
-
-def decrypt_and_reconstruct_png(encrypted_png_path, private_key, decrypted_png_path, mode=0):
+    # source - ścieżka, bajty lub plik binarny, dst - plik binarny otwarty do zapisu (np. io.BytesIO)
+    # collect = True - zwraca też wszystkie zaszyfrowane dane IDAT (np. do wyświetlenia)
+    # Wszystkie chunki IDAT to jeden strumień, zapisywany w chunkach po idat_chunk_size bajtów
+    # verify_crc = True - sprawdza CRC chunków wejścia (pozostałe chunki są kopiowane z oryginalnym CRC)
+    # compact = True - format kompaktowy (długość w chunku LENGTH_CHUNK zamiast paddingu)
+    # compress_level = 0 - szyfrogram zapisywany w blokach zlib bez kompresji (mode = 0)
+    # compression - deflate.Compression (poziom, strategia, wątki), zastępuje compress_level
+    # shard_blocks - liczba bloków RSA w jednym zadaniu dla procesu (parallel.map_blocks)
+    if compact:
+        encryptor = CompactEncryptor(public_key, workers, shard_blocks)
+    else:
+        encryptor = rsa_encryptor(public_key, workers, shard_blocks)
+    with open_png(source) as src:
+        return transform_png(src, dst, encryptor, mode, idat_chunk_size, collect=collect, verify_crc=verify_crc,
+                             compress_level=compress_level, compression=compression,
+                             append_chunks=encryptor.length_chunks if compact else None)
+
+def modify_png_bytes(data, public_key, *args, **kwargs):
+    # Jak modify_png_stream, ale zwraca zaszyfrowany PNG jako bytes
+    dst = io.BytesIO()
+    modify_png_stream(data, public_key, dst, *args, **kwargs)
+    return dst.getvalue()
+
+def modify_png(file_path, public_key, save_path, mode=0, workers=None, collect=False,
+               idat_chunk_size=IDAT_CHUNK_SIZE, verify_crc=False, compact=False, compress_level=-1, compression=None,
+               shard_blocks=DEFAULT_SHARD_BLOCKS):
+    with open_output(save_path) as dst, open_png(file_path) as src:
+        return modify_png_stream(src, public_key, dst, mode, workers, collect, idat_chunk_size, verify_crc,
+                                 compact, compress_level, compression, shard_blocks)
+
+def decrypt_and_reconstruct_png_stream(source, private_key, dst, mode=0, use_crt=True, workers=None,
+                                       idat_chunk_size=IDAT_CHUNK_SIZE, verify_crc=False, compression=None,
+                                       shard_blocks=DEFAULT_SHARD_BLOCKS):
     # mode = 0 decompression->decryption->compression
     # mode = 1 decryption
-    data = read_png(encrypted_png_path)
-    new_png_data = bytearray(data[:8])  # Kopiowanie nagłówka PNG
-    pos = 8
-
-    while pos < len(data):
-        chunk_len = struct.unpack('>I', data[pos:pos + 4])[0]
-        pos += 4
-        chunk_type = data[pos:pos + 4]
-        pos += 4
-        chunk_data = data[pos:pos + chunk_len]
-        pos += chunk_len
-        crc = data[pos:pos + 4]
-        pos += 4
-
-        if chunk_type == b'IDAT':
-            try:
-                if mode==0:
-                    encrypted_data = zlib.decompress(chunk_data)
-                elif mode==1:
-                    encrypted_data=chunk_data
-                # Deszyfrowanie danych
-                decrypted_data = rsa_decrypt(encrypted_data, private_key)
-                # Usunięcie paddingu
-                padded_decrypted_data = remove_padding(decrypted_data)
-                # Kompresja danych po usunięciu paddingu
-                if mode==0:
-                    decompressed_data = zlib.compress(padded_decrypted_data)
-                elif mode==1:
-                    decompressed_data = padded_decrypted_data
-                chunk_data = decompressed_data
-                chunk_len = len(chunk_data)
-            except zlib.error as e:
-                print(f"Błąd zlib przy próbie dekompresji: {str(e)}")
-                continue  # Przechodź do kolejnego chunka, pomijając uszkodzone
-
-        # Obliczanie nowego CRC dla zmodyfikowanego chunku
-        new_crc = zlib.crc32(chunk_type)
-        new_crc = zlib.crc32(chunk_data, new_crc)
-        new_crc = struct.pack('>I', new_crc & 0xffffffff)
-
-        # Rekonstrukcja chunków PNG
-        new_png_data.extend(struct.pack('>I', chunk_len))
-        new_png_data.extend(chunk_type)
-        new_png_data.extend(chunk_data)
-        new_png_data.extend(new_crc)
-
-    with open(decrypted_png_path, 'wb') as file:
-        file.write(new_png_data)
-
-
-public_key, private_key = generate_rsa_keys(bits=1024)
-original_png_path = "example.png"
-encrypted_png_path = "encrypted_example.png"
-decrypted_png_path = "decrypted_example.png"
-
-print("Obraz oryginalny:")
-display_image_from_bytes(read_png(original_png_path))
-
-for mode in range(2):
-    new_png_data, encrypted_image_data = modify_png(original_png_path, public_key, encrypted_png_path, mode)
-    decrypt_and_reconstruct_png(encrypted_png_path, private_key, decrypted_png_path, mode)
-
-    print("Dane obrazu zaszyfrowanego:")
-    display_encrypted_image(encrypted_image_data)
-    print("Obraz odszyfrowany:")
-    display_image_from_bytes(read_png(decrypted_png_path))
+    # Format (padding albo kompaktowy) rozpoznawany jest po chunku LENGTH_CHUNK
+    # compression - ustawienia ponownej kompresji odszyfrowanych danych (deflate.Compression)
+    # shard_blocks - jak w modify_png_stream
+    decryptor = RsaDecryptor(private_key, use_crt, workers, shard_blocks)
+    with open_png(source) as src:
+        transform_png(src, dst, decryptor, mode, idat_chunk_size,
+                      consume_chunks={LENGTH_CHUNK: decryptor.load_length}, verify_crc=verify_crc,
+                      compression=compression)
+
+def decrypt_and_reconstruct_png_bytes(data, private_key, *args, **kwargs):
+    # Jak decrypt_and_reconstruct_png_stream, ale zwraca odszyfrowany PNG jako bytes
+    dst = io.BytesIO()
+    decrypt_and_reconstruct_png_stream(data, private_key, dst, *args, **kwargs)
+    return dst.getvalue()
+
+def decrypt_and_reconstruct_png(encrypted_png_path, private_key, decrypted_png_path, mode=0, use_crt=True, workers=None,
+                                idat_chunk_size=IDAT_CHUNK_SIZE, verify_crc=False, compression=None,
+                                shard_blocks=DEFAULT_SHARD_BLOCKS):
+    with open_output(decrypted_png_path) as dst, open_png(encrypted_png_path) as src:
+        decrypt_and_reconstruct_png_stream(src, private_key, dst, mode, use_crt, workers,
+                                           idat_chunk_size, verify_crc, compression, shard_blocks)
+
+if __name__ == "__main__":
+    public_key, private_key = load_or_generate_keys('rsa_1024.key', bits=1024)
+    original_png_path = "example.png"
+    encrypted_png_path = "encrypted_example.png"
+    decrypted_png_path = "decrypted_example.png"
+
+    print("Obraz oryginalny:")
+    display_image_from_bytes(read_png(original_png_path))
+
+    for mode in range(2):
+        encrypted_image_data = modify_png(original_png_path, public_key, encrypted_png_path, mode, collect=True)
+        decrypt_and_reconstruct_png(encrypted_png_path, private_key, decrypted_png_path, mode)
+
+        print("Dane obrazu zaszyfrowanego:")
+        display_encrypted_image(encrypted_image_data)
+        print("Obraz odszyfrowany:")
+        display_image_from_bytes(read_png(decrypted_png_path))
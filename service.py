@@ -0,0 +1,117 @@
+"""Asynchroniczna fasada szyfrowania i deszyfrowania PNG dla serwera (asyncio + pula procesów).
+
+Przykład:
+    async with PngCryptoService(load_keys('rsa_1024.key'), scheme='ctr') as service:
+        encrypted = await service.encrypt(png_bytes)
+        decrypted = await service.decrypt(encrypted)
+"""
+import asyncio
+import os
+
+SCHEMES = ['rsa', 'lib_version', 'ctr']
+
+
+def process_bytes(command, scheme, keys, data, options):
+    """Zadanie wykonywane w procesie puli: szyfruje (command = 'encrypt') lub deszyfruje PNG w pamięci.
+
+    options - dodatkowe argumenty funkcji wybranego schematu.
+    """
+    public_key, private_key = keys
+    if scheme == 'rsa':
+        import rsa
+        if command == 'encrypt':
+            return rsa.modify_png_bytes(data, public_key, workers=1, **options)
+        return rsa.decrypt_and_reconstruct_png_bytes(data, private_key, workers=1, **options)
+    if scheme == 'lib_version':
+        import lib_version
+        public_key, private_key = lib_version.to_cryptography_keys(public_key, private_key)
+        if command == 'encrypt':
+            return lib_version.modify_png_bytes(data, public_key, threads=1, **options)
+        return lib_version.decrypt_and_reconstruct_png_bytes(data, private_key, threads=1, **options)
+    if scheme == 'ctr':
+        import ctr
+        if command == 'encrypt':
+            return ctr.modify_png_ctr_bytes(data, public_key, workers=1, **options)
+        return ctr.decrypt_and_reconstruct_png_ctr_bytes(data, public_key, private_key, workers=1, **options)
+    raise ValueError(f"Nieznany schemat: {scheme}")
+
+
+class PngCryptoService:
+    """Szyfrowanie i deszyfrowanie PNG jako korutyny; praca CPU trafia do puli procesów.
+
+    max_concurrency - ile zadań naraz wykonuje pula, max_queue - ile kolejnych może czekać;
+    gdy kolejka jest pełna, wywołanie czeka na miejsce (wait = True) albo zgłasza asyncio.QueueFull.
+    Anulowanie zadania czekającego w kolejce zwalnia jego miejsce, a zadania już liczonego w procesie
+    nie da się przerwać, więc jego miejsce w puli zwalnia się dopiero po zakończeniu obliczeń.
+    """
+
+    def __init__(self, keys, scheme='ctr', workers=None, max_concurrency=None, max_queue=64):
+        if scheme not in SCHEMES:
+            raise ValueError(f"Nieznany schemat: {scheme}")
+        self.keys = keys
+        self.scheme = scheme
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or self.workers
+        self.max_queue = max_queue
+        self.executor = None
+        self.slots = None
+        self.admission = None
+
+    async def start(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+        self.admission = asyncio.Semaphore(self.max_concurrency + self.max_queue)
+        return self
+
+    async def close(self):
+        if self.executor is not None:
+            executor, self.executor = self.executor, None
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def encrypt(self, source, output=None, wait=True, **options):
+        """Szyfruje PNG z bajtów lub strumienia asynchronicznego (read()); options trafiają do funkcji schematu."""
+        return await self._submit('encrypt', source, output, wait, options)
+
+    async def decrypt(self, source, output=None, wait=True, **options):
+        """Deszyfruje PNG; output - opcjonalny strumień asynchroniczny (write/drain) na wynik."""
+        return await self._submit('decrypt', source, output, wait, options)
+
+    async def _submit(self, command, source, output, wait, options):
+        if self.executor is None:
+            raise RuntimeError("Usługa nie została uruchomiona (start() lub async with)")
+        if not wait and self.admission.locked():
+            raise asyncio.QueueFull(f"Kolejka pełna ({self.max_queue} oczekujących zadań)")
+        async with self.admission:
+            data = source if isinstance(source, (bytes, bytearray, memoryview)) else await source.read()
+            result = await self._run(command, bytes(data), options)
+        if output is not None:
+            output.write(result)
+            await output.drain()
+        return result
+
+    async def _run(self, command, data, options):
+        loop = asyncio.get_running_loop()
+        await self.slots.acquire()
+        try:
+            future = self.executor.submit(process_bytes, command, self.scheme, self.keys, data, options)
+        except BaseException:
+            self.slots.release()
+            raise
+
+        def release(_):
+            # Miejsce w puli wraca dopiero, gdy proces skończył (także po anulowaniu)
+            try:
+                loop.call_soon_threadsafe(self.slots.release)
+            except RuntimeError:
+                pass  # Pętla zdarzeń jest już zamknięta
+
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)